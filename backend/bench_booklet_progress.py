@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark round trips and latency of ContentService.get_booklets_with_progress
+for a 500-activity catalogue, against the old per-activity progress lookup
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Dummy settings so core.config loads without a .env file
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+
+from services.content.service import ContentService
+
+BOOKLETS = 10
+MODULES_PER_BOOKLET = 5
+ACTIVITIES_PER_MODULE = 10
+ROUND_TRIP_SECONDS = 0.005  # Simulated Supabase latency per query
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Just enough of the query builder to serve the content service"""
+    
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = {}
+    
+    def select(self, *args, **kwargs):
+        return self
+    
+    def order(self, *args, **kwargs):
+        return self
+    
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+    
+    async def execute(self):
+        self.db.round_trips += 1
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        rows = self.db.tables[self.table]
+        return FakeResult([row for row in rows if all(row.get(k) == v for k, v in self.filters.items())])
+
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+        self.round_trips = 0
+    
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def build_catalogue(child_id):
+    """Booklet tree with 500 activities, half of them with progress rows"""
+    booklets, progress = [], []
+    for b in range(BOOKLETS):
+        modules = []
+        for m in range(MODULES_PER_BOOKLET):
+            activities = []
+            for a in range(ACTIVITIES_PER_MODULE):
+                activity_id = str(uuid.uuid4())
+                activities.append({"id": activity_id, "type": "in_app", "points": 10, "est_minutes": 10, "instructions": f"Activity {a}"})
+                if a % 2 == 0:
+                    progress.append({"id": str(uuid.uuid4()), "child_id": child_id, "activity_id": activity_id, "status": "completed"})
+            modules.append({"id": str(uuid.uuid4()), "idx": m + 1, "title": f"Module {m + 1}", "description": "", "activities": activities})
+        booklets.append({"id": str(uuid.uuid4()), "title": f"Booklet {b}", "subtitle": "", "subject": "Reading", "total_modules": MODULES_PER_BOOKLET, "modules": modules})
+    
+    return {
+        "children": [{"id": child_id, "parent_user_id": "bench-parent"}],
+        "booklets": booklets,
+        "activity_progress": progress
+    }
+
+
+async def legacy_per_activity_lookup(supabase, child_id):
+    """The previous access pattern: one progress query per activity"""
+    booklets = (await supabase.table("booklets").select("*").execute()).data
+    for booklet in booklets:
+        for module in booklet["modules"]:
+            for activity in module["activities"]:
+                await supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity["id"]).execute()
+
+
+async def run_benchmark():
+    print("⏱️  Booklet progress benchmark")
+    print("=" * 40)
+    
+    child_id = str(uuid.uuid4())
+    tables = build_catalogue(child_id)
+    activity_count = BOOKLETS * MODULES_PER_BOOKLET * ACTIVITIES_PER_MODULE
+    print(f"📚 {activity_count} activities, {ROUND_TRIP_SECONDS * 1000:.0f} ms simulated round trip")
+    
+    legacy_db = FakeSupabase(tables)
+    started = time.perf_counter()
+    await legacy_per_activity_lookup(legacy_db, child_id)
+    legacy_elapsed = time.perf_counter() - started
+    print(f"🐢 Per-activity lookup: {legacy_db.round_trips} round trips, {legacy_elapsed * 1000:.0f} ms")
+    
+    service = ContentService.__new__(ContentService)
+    service.supabase = FakeSupabase(tables)
+    started = time.perf_counter()
+    booklets = await service.get_booklets_with_progress(week=None, child_id=child_id, user_id="bench-parent")
+    elapsed = time.perf_counter() - started
+    attached = sum(1 for b in booklets for m in b.modules for a in m.activities if a.progress)
+    print(f"🚀 Single progress query: {service.supabase.round_trips} round trips, {elapsed * 1000:.0f} ms ({attached} progress rows attached)")
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run_benchmark()))
@@ -6,15 +6,21 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from typing import Optional, Dict, Any
+import asyncio
 import httpx
 import logging
+import time
 from .config import settings
-from .database import get_supabase_client
+from .database import get_async_supabase_client
+from .cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Resolved users keyed by user ID, so the profile lookup is skipped on repeat requests
+_user_cache = TTLCache("auth_users", maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
 
 class AuthUser:
     """Authenticated user model"""
@@ -28,8 +34,8 @@ class AuthUser:
 async def get_supabase_jwks() -> Dict[str, Any]:
     """Fetch Supabase JWKS for JWT validation"""
     try:
-        jwks_url = f"{settings.SUPABASE_URL}/auth/v1/jwks"
-        async with httpx.AsyncClient() as client:
+        jwks_url = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+        async with httpx.AsyncClient(timeout=5.0) as client:
             response = await client.get(jwks_url)
             response.raise_for_status()
             return response.json()
@@ -41,22 +47,89 @@ async def get_supabase_jwks() -> Dict[str, Any]:
         )
 
 
+class JWKSCache:
+    """Signing keys from the Supabase JWKS, refreshed periodically or on an unknown kid"""
+    
+    def __init__(self, refresh_interval: float, min_refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._refresh_error: Optional[HTTPException] = None
+        self._lock = asyncio.Lock()
+    
+    def set_keys(self, jwks: Dict[str, Any]) -> None:
+        """Replace the cached key set"""
+        self._keys = {key["kid"]: key for key in jwks.get("keys", []) if key.get("kid")}
+        self._fetched_at = time.monotonic()
+        self._attempted_at = self._fetched_at
+        self._refresh_error = None
+    
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        """Get the JWK for a key ID, refreshing the key set if needed"""
+        age = time.monotonic() - self._fetched_at
+        key = self._keys.get(kid)
+        
+        if key is not None and age < self.refresh_interval:
+            return key
+        
+        # Unknown kid (key rotation) or stale set; throttle refresh attempts, failed
+        # ones included, so bogus kids or an outage can't hammer the JWKS endpoint
+        # (callers without a usable key also wait for a refresh already in flight)
+        if time.monotonic() - self._attempted_at >= self.min_refresh_interval or (key is None and self._lock.locked()):
+            async with self._lock:
+                if time.monotonic() - self._attempted_at >= self.min_refresh_interval:
+                    self._attempted_at = time.monotonic()
+                    try:
+                        self.set_keys(await get_supabase_jwks())
+                        logger.info(f"Refreshed JWKS, {len(self._keys)} keys cached")
+                    except HTTPException as e:
+                        # Keep serving the cached keys; retry after min_refresh_interval
+                        logger.warning(f"JWKS refresh failed, keeping {len(self._keys)} cached keys")
+                        self._refresh_error = e
+        
+        key = self._keys.get(kid)
+        if key is None and self._refresh_error is not None:
+            # No usable key and the key set could not be refreshed
+            raise self._refresh_error
+        return key
+
+
+_jwks_cache = JWKSCache(
+    refresh_interval=settings.JWKS_REFRESH_INTERVAL,
+    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL
+)
+
+
 async def verify_jwt_token(token: str) -> Dict[str, Any]:
     """Verify JWT token using Supabase JWKS"""
     try:
-        # For development, we'll use a simpler approach
-        # In production, implement proper JWKS validation
-        
-        # Decode without verification for now (development only)
+        # Decode without verification (development only)
         if settings.DEBUG:
             payload = jwt.get_unverified_claims(token)
             return payload
         
-        # Production JWKS validation would go here
-        jwks = await get_supabase_jwks()
-        # Implementation for production JWKS validation
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
         
-        return {}
+        if algorithm == "HS256":
+            # Legacy projects sign with the shared JWT secret instead of asymmetric keys
+            if not settings.SUPABASE_JWT_SECRET:
+                raise JWTError("HS256 token received but SUPABASE_JWT_SECRET is not configured")
+            key = settings.SUPABASE_JWT_SECRET
+        else:
+            key = await _jwks_cache.get_key(header.get("kid"))
+            if key is None:
+                raise JWTError(f"Unknown signing key: {header.get('kid')}")
+            algorithm = key.get("alg", algorithm)
+        
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.SUPABASE_JWT_AUDIENCE
+        )
     except JWTError as e:
         logger.error(f"JWT validation failed: {e}")
         raise HTTPException(
@@ -83,9 +156,13 @@ async def get_current_user(
                 detail="Invalid token payload"
             )
         
+        cached_user = _user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+        
         # Fetch user profile from Supabase
-        supabase = get_supabase_client()
-        profile_result = supabase.table("profiles").select("*").eq("user_id", user_id).execute()
+        supabase = get_async_supabase_client()
+        profile_result = await supabase.table("profiles").select("*").eq("user_id", user_id).execute()
         
         profile_data = {}
         role = "parent"  # default
@@ -94,12 +171,15 @@ async def get_current_user(
             profile_data = profile_result.data[0]
             role = profile_data.get("role", "parent")
         
-        return AuthUser(
+        auth_user = AuthUser(
             user_id=user_id,
             email=email,
             role=role,
             profile_data=profile_data
         )
+        _user_cache.set(user_id, auth_user)
+        
+        return auth_user
         
     except HTTPException:
         raise
@@ -111,6 +191,11 @@ async def get_current_user(
         )
 
 
+def invalidate_cached_user(user_id: str) -> None:
+    """Drop a user's cached profile, e.g. after the profile is edited"""
+    _user_cache.invalidate(user_id)
+
+
 async def get_current_parent(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
     """Ensure current user is a parent"""
     if current_user.role != "parent":
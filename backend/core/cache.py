@@ -0,0 +1,196 @@
+"""
+In-process caching utilities shared by the services
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Registry of named caches, used for reporting stats
+_caches: Dict[str, Any] = {}
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed TTL"""
+    
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        _caches[name] = self
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or default if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._data.move_to_end(key)
+        
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this cache"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+class DiskCache:
+    """
+    JSON values stored as one file per key, expiring after a TTL and trimmed oldest-first past a byte budget.
+    
+    The directory may be shared by several worker processes. Each keeps a running estimate of its
+    size, re-measured from the directory every RESCAN_INTERVAL seconds and before trimming, so writes
+    by the other processes count against the budget too.
+    """
+    
+    RESCAN_INTERVAL = 60.0
+    
+    def __init__(self, name: str, directory: str, max_bytes: int, ttl: float):
+        self.name = name
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._bytes = 0
+        self._scanned_at = 0.0
+        self._scan()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        _caches[name] = self
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a stored value, or default if missing, expired or unreadable"""
+        path = self._path(key)
+        try:
+            if path.stat().st_mtime + self.ttl < time.time():
+                self._remove(path)
+                self.misses += 1
+                return default
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.misses += 1
+            return default
+        
+        self.hits += 1
+        return value
+    
+    def set(self, key: str, value: Any) -> None:
+        """Write a value atomically, then trim the directory if it is over budget"""
+        path = self._path(key)
+        encoded = json.dumps(value, default=str).encode("utf-8")
+        try:
+            previous = path.stat().st_size if path.exists() else 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+            self._bytes += len(encoded) - previous
+        except OSError as e:
+            logger.warning(f"{self.name}: could not write cache entry: {e}")
+            return
+        
+        if time.monotonic() - self._scanned_at >= self.RESCAN_INTERVAL:
+            self._scan()
+        if self._bytes > self.max_bytes:
+            self._trim()
+    
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._bytes -= size
+        except OSError:
+            pass
+    
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        """Re-measure the directory, including other processes' entries; returns (mtime, size, path) per entry"""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                # Removed by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        self._bytes = sum(size for _, size, _ in entries)
+        self._scanned_at = time.monotonic()
+        return entries
+    
+    def _trim(self) -> None:
+        """Delete the least recently written entries until the directory is back under 90% of the budget"""
+        for _, _, path in sorted(self._scan()):
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            self._remove(path)
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this cache"""
+        lookups = self.hits + self.misses
+        return {
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every registered cache"""
+    return {name: cache.stats() for name, cache in _caches.items()}
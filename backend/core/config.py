@@ -20,9 +20,15 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_SERVICE_ROLE_KEY: str
     SUPABASE_ANON_KEY: str
+    SUPABASE_JWT_SECRET: str = ""  # Only needed for projects still signing with HS256
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    JWKS_REFRESH_INTERVAL: float = 600.0  # Seconds between routine JWKS refreshes
+    JWKS_MIN_REFRESH_INTERVAL: float = 30.0  # Minimum gap between refreshes triggered by unknown kids
     
     # Database (optional - uses Supabase by default)
     DATABASE_URL: str = ""
+    DB_POOL_SIZE: int = 16  # Max concurrent Supabase queries per process
+    DB_QUERY_TIMEOUT: float = 10.0  # Seconds before a query is abandoned
     
     # External Services
     POSTHOG_KEY: str = ""
@@ -31,10 +37,29 @@ class Settings(BaseSettings):
 
     # OpenAI Configuration
     OPENAI_API_KEY: str = ""
+    OPENAI_API_BASE: str = "https://hkust.azure-api.net/openai"
+    OPENAI_API_VERSION: str = "2024-10-21"
+    OPENAI_DEPLOYMENT: str = "gpt-4o"
+    OPENAI_TIMEOUT: float = 30.0  # Seconds allowed for one model call
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    OPENAI_MAX_CONCURRENCY: int = 8  # Model calls in flight per process
+    OPENAI_MAX_RETRIES: int = 2  # Retries on timeouts, 429 and 5xx
+    OPENAI_RETRY_BACKOFF: float = 0.5  # Base seconds for exponential backoff
     
     # Hugging Face Configuration
     HF_TOKEN: str = ""
     
+    # AI explanation jobs
+    AI_JOB_STORE: str = "local"  # "local" (in-process) or "supabase" (durable ai_jobs table)
+    AI_JOB_WORKERS: int = 2  # Explanations generated in parallel per process
+    AI_JOB_TIMEOUT: float = 90.0  # Seconds allowed for one explanation
+    AI_JOB_MAX_ATTEMPTS: int = 2  # Durable jobs abandoned by a dead worker are retried up to this many runs
+    AI_JOB_RATE_LIMIT: int = 10  # Jobs per user per window
+    AI_JOB_RATE_WINDOW: float = 60.0
+    AI_JOB_RETENTION: float = 600.0  # Seconds finished jobs stay pollable (and deduplicate resubmissions)
+    AI_JOB_POLL_INTERVAL: float = 1.0  # Seconds idle workers wait before checking a durable store again
+    AI_JOB_WAIT_TIMEOUT: float = 120.0  # Seconds the legacy JSON endpoint waits for its job (at least AI_JOB_TIMEOUT)
+    
     # Frontend API URL
     EXPO_PUBLIC_API_URL: str = "http://192.168.1.100:8000"
     
@@ -46,6 +71,35 @@ class Settings(BaseSettings):
         """Parse CORS origins from comma-separated string"""
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",") if origin.strip()]
     
+    @property
+    def ai_job_wait_timeout(self) -> float:
+        """Wait for a job's outcome, never shorter than the job may run, since old clients cannot poll"""
+        return max(self.AI_JOB_WAIT_TIMEOUT, self.AI_JOB_TIMEOUT)
+    
+    # Caching
+    AUTH_CACHE_TTL: float = 60.0  # Seconds an authenticated user's profile stays cached
+    AUTH_CACHE_SIZE: int = 4096
+    OWNERSHIP_CACHE_TTL: float = 60.0  # Seconds a parent's child list is trusted for access checks
+    CATALOGUE_CACHE_TTL: float = 300.0  # Seconds before the booklet catalogue is re-read
+    METRICS_CACHE_TTL: float = 30.0  # Seconds a parent's dashboard metrics are reused
+    JUDGEMENT_CACHE_TTL: float = 86400.0  # Seconds a VocabVenture judgement is reused for the same image and word
+    JUDGEMENT_CACHE_SIZE: int = 2048
+    JUDGEMENT_CACHE_DIR: str = ""  # Directory for the on-disk judgement tier; empty disables it
+    JUDGEMENT_CACHE_DISK_MB: int = 64
+    
+    # User bundle
+    BUNDLE_CONCURRENCY: int = 4  # Children loaded in parallel per bundle request
+    BUNDLE_SECTION_TIMEOUT: float = 8.0  # Seconds allowed for each per-child section
+    BUNDLE_CACHE_TTL: float = 30.0  # Seconds a built bundle is reused server-side
+    BUNDLE_CACHE_SIZE: int = 2048
+    
+    # Tokens
+    TOKEN_REBUILD_BATCH_SIZE: int = 500  # Accounts per batch when rebuilding balance snapshots
+    LEADERBOARD_BATCH_SIZE: int = 100  # Classes per batch when recomputing leaderboards
+    
+    # Analytics
+    KPI_ROLLUP_BATCH_SIZE: int = 200  # Children per batch in a full KPI rollup
+    
     # API Configuration
     API_V1_PREFIX: str = "/api/v1"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
@@ -53,6 +107,12 @@ class Settings(BaseSettings):
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES: List[str] = ["image/jpeg", "image/png", "application/pdf", "audio/mpeg"]
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024  # Bytes read from an upload at a time
+    
+    # Image preprocessing before model calls (needs Pillow; images pass through unchanged without it)
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_MAX_DIMENSION: int = 1024  # Longest side in pixels sent to vision models
+    IMAGE_JPEG_QUALITY: int = 80
     
     class Config:
         env_file = ".env"
@@ -3,8 +3,12 @@ Database configuration and Supabase client setup
 """
 
 from supabase import create_client, Client
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+import asyncio
+import functools
 import logging
+import time
 from .config import settings
 
 logger = logging.getLogger(__name__)
@@ -12,6 +16,10 @@ logger = logging.getLogger(__name__)
 # Global Supabase client instance
 _supabase_client: Optional[Client] = None
 
+# Global async client and query pool instances
+_async_supabase_client: Optional["AsyncSupabaseClient"] = None
+_query_pool: Optional["QueryPool"] = None
+
 
 def get_supabase_client() -> Client:
     """Get or create Supabase client instance"""
@@ -39,6 +47,145 @@ def get_anon_supabase_client() -> Client:
     )
 
 
+class QueryPool:
+    """Bounded worker pool that runs blocking Supabase calls off the event loop"""
+    
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="supabase-query")
+        self._slots = asyncio.Semaphore(size)
+        
+        # Pool metrics
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.total_seconds = 0.0
+    
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking call on the pool, waiting at most `timeout` seconds for it"""
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        
+        self.in_flight += 1
+        started = time.perf_counter()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        # The slot is only freed once the worker thread is really done, so a
+        # timed-out query still counts against the pool until it returns
+        future.add_done_callback(lambda f: self._release(f, started))
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.error(f"Database query timed out after {timeout}s")
+            raise TimeoutError(f"Database query timed out after {timeout}s")
+    
+    def _release(self, future: asyncio.Future, started: float) -> None:
+        self.in_flight -= 1
+        self.total_seconds += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._slots.release()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of pool usage"""
+        finished = self.completed + self.failed
+        return {
+            "pool_size": self.size,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_query_ms": round(self.total_seconds / finished * 1000, 2) if finished else 0.0
+        }
+
+
+class AsyncQuery:
+    """Query builder wrapper whose execute() runs on the query pool"""
+    
+    def __init__(self, builder: Any, pool: QueryPool):
+        self._builder = builder
+        self._pool = pool
+    
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        
+        if hasattr(attr, "execute"):
+            # Builder-valued properties such as `not_`
+            return AsyncQuery(attr, self._pool)
+        
+        if not callable(attr):
+            return attr
+        
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return AsyncQuery(result, self._pool) if hasattr(result, "execute") else result
+        
+        return call
+    
+    async def execute(self, timeout: Optional[float] = None):
+        """Execute the query without blocking the event loop"""
+        return await self._pool.run(self._builder.execute, timeout=timeout)
+
+
+class AsyncSupabaseClient:
+    """Async facade over the Supabase client backed by a bounded query pool"""
+    
+    def __init__(self, client: Client, pool: QueryPool):
+        self.client = client
+        self.pool = pool
+    
+    def table(self, table_name: str) -> AsyncQuery:
+        """Get table query builder"""
+        return AsyncQuery(self.client.table(table_name), self.pool)
+    
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None) -> AsyncQuery:
+        """Get stored procedure call builder"""
+        return AsyncQuery(self.client.rpc(fn, params or {}), self.pool)
+    
+    @property
+    def storage(self):
+        """Storage client (blocking calls must go through run())"""
+        return self.client.storage
+    
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run any other blocking client call (e.g. storage uploads) on the pool"""
+        return await self.pool.run(fn, *args, **kwargs)
+
+
+def get_query_pool() -> QueryPool:
+    """Get or create the shared query pool"""
+    global _query_pool
+    
+    if _query_pool is None:
+        _query_pool = QueryPool(settings.DB_POOL_SIZE, settings.DB_QUERY_TIMEOUT)
+        logger.info(f"Query pool initialized with {settings.DB_POOL_SIZE} workers")
+    
+    return _query_pool
+
+
+def get_async_supabase_client() -> AsyncSupabaseClient:
+    """Get or create async Supabase client instance"""
+    global _async_supabase_client
+    
+    if _async_supabase_client is None:
+        _async_supabase_client = AsyncSupabaseClient(get_supabase_client(), get_query_pool())
+    
+    return _async_supabase_client
+
+
 class DatabaseManager:
     """Database operations manager"""
     
@@ -49,12 +196,16 @@ class DatabaseManager:
         """Check database connectivity"""
         try:
             # Simple query to test connection
-            result = self.client.table("profiles").select("count").limit(1).execute()
+            result = await get_async_supabase_client().table("profiles").select("count").limit(1).execute()
             return True
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
             return False
     
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """Get query pool metrics"""
+        return get_query_pool().metrics()
+    
     def get_table(self, table_name: str):
         """Get table reference for queries"""
         return self.client.table(table_name)
@@ -69,4 +220,4 @@ class DatabaseManager:
 
 
 # Global database manager instance
-db_manager = DatabaseManager() 
\ No newline at end of file
+db_manager = DatabaseManager()
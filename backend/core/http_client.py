@@ -0,0 +1,139 @@
+"""
+Pooled async HTTP client for upstream model APIs
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Registry of named clients, used for reporting stats and closing on shutdown
+_clients: Dict[str, "PooledHTTPClient"] = {}
+
+# Upstream responses worth retrying
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class PooledHTTPClient:
+    """Keep-alive connection pool with bounded concurrency, timeouts and retries with backoff"""
+    
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff: float = 0.5
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._total_seconds = 0.0
+        
+        _clients[name] = self
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared httpx client, created on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+    
+    async def post_json(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """POST a JSON payload and return the decoded JSON response, retrying transient failures"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._send(url, payload, headers)
+            except httpx.TransportError as e:
+                # Connection problems and timeouts
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"{self.name}: {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    if response.is_error:
+                        self.failures += 1
+                    response.raise_for_status()
+                    return response.json()
+                delay = self._backoff_delay(attempt, response.headers.get("retry-after"))
+                logger.warning(f"{self.name}: HTTP {response.status_code} on attempt {attempt + 1}, retrying in {delay:.2f}s")
+            
+            self.retries += 1
+            await asyncio.sleep(delay)
+    
+    async def _send(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]]) -> httpx.Response:
+        """One request, holding a concurrency slot only while it is on the wire"""
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return await self.client.post(url, json=payload, headers=headers)
+            finally:
+                self.in_flight -= 1
+                self.requests += 1
+                self._total_seconds += time.perf_counter() - started
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with jitter, honouring a numeric Retry-After header"""
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+    
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Usage counters for this client"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "avg_request_ms": round(self._total_seconds / self.requests * 1000, 1) if self.requests else 0.0
+        }
+
+
+def get_http_client_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every registered client"""
+    return {name: client.stats() for name, client in _clients.items()}
+
+
+async def close_http_clients() -> None:
+    """Close every registered client, e.g. on application shutdown"""
+    for client in _clients.values():
+        await client.aclose()
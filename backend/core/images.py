@@ -0,0 +1,143 @@
+"""
+Image preprocessing before model calls: sniff the real format, downscale and re-encode
+"""
+
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+import base64
+import binascii
+import io
+import logging
+import threading
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pillow is optional: without it images are forwarded as-is, but with their real MIME type
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Running totals, reported on /health/upstream; updated from worker threads, hence the lock
+_stats = {"images": 0, "resized": 0, "original_bytes": 0, "final_bytes": 0}
+_stats_lock = threading.Lock()
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """MIME type from the file signature, or None if it is not a known image format"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    if data.startswith(b"BM"):
+        return "image/bmp"
+    return None
+
+
+def decode_base64_image(image_base64: str) -> bytes:
+    """Raw bytes from base64 or a data URL; raises ValueError if it is not valid base64"""
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[-1]
+    try:
+        # Some mobile encoders wrap lines, so drop whitespace before strict decoding
+        return base64.b64decode("".join(image_base64.split()), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 image data")
+
+
+def _downscale(source: BinaryIO) -> Optional[Tuple[bytes, str]]:
+    """JPEG re-encode fitted inside IMAGE_MAX_DIMENSION, or None if Pillow cannot read the image"""
+    max_dimension = settings.IMAGE_MAX_DIMENSION
+    try:
+        with Image.open(source) as image:
+            # Let the JPEG decoder skip detail we are about to throw away
+            image.draft("RGB", (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension))
+            
+            if image.mode in ("RGBA", "LA", "P"):
+                # Screenshots often carry alpha; flatten onto white for JPEG
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True)
+            return output.getvalue(), "image/jpeg"
+    except Exception as e:
+        logger.warning(f"Could not re-encode image, sending original: {e}")
+        return None
+
+
+def prepare_image(image_base64: str) -> Dict[str, Any]:
+    """Shrink a base64 or data URL image for a model call"""
+    return prepare_image_data(decode_base64_image(image_base64))
+
+
+def prepare_image_data(source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+    """
+    Shrink raw image bytes or a seekable stream for a model call
+    
+    Returns the data URL to send plus the original and final sizes. The original is kept
+    whenever re-encoding would not make it smaller. Streams are only read in full when the
+    original has to be sent.
+    """
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    original_size = stream.seek(0, io.SEEK_END)
+    stream.seek(0)
+    mime_type = sniff_image_type(stream.read(16))
+    stream.seek(0)
+    if mime_type is None:
+        # Unknown signature: keep the old behaviour of labelling it JPEG and let the model decide
+        logger.warning("Unrecognised image signature, forwarding as JPEG")
+        mime_type = "image/jpeg"
+    
+    final = None
+    final_type = mime_type
+    if Image is not None and settings.IMAGE_PREPROCESS_ENABLED:
+        reencoded = _downscale(stream)
+        if reencoded is not None and len(reencoded[0]) < original_size:
+            final, final_type = reencoded
+    
+    resized = final is not None
+    if not resized:
+        stream.seek(0)
+        final = stream.read()
+    
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["resized"] += int(resized)
+        _stats["original_bytes"] += original_size
+        _stats["final_bytes"] += len(final)
+    if resized:
+        logger.info(f"Image {mime_type} {original_size} B -> {final_type} {len(final)} B ({original_size - len(final)} B saved)")
+    
+    return {
+        "data_url": f"data:{final_type};base64,{base64.b64encode(final).decode('ascii')}",
+        "mime_type": final_type,
+        "original_bytes": original_size,
+        "final_bytes": len(final),
+        "bytes_saved": original_size - len(final),
+        "resized": resized
+    }
+
+
+def get_image_stats() -> Dict[str, Any]:
+    """Totals for images prepared by this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        **stats,
+        "bytes_saved": stats["original_bytes"] - stats["final_bytes"],
+        "pillow_available": Image is not None
+    }
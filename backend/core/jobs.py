@@ -0,0 +1,416 @@
+"""
+Background job queue: submit/poll jobs run by a bounded pool of local workers.
+
+Jobs live in a JobStore. LocalJobStore keeps them in process memory (a stand-in for
+development and single-process deployments); SupabaseJobStore keeps them in the
+ai_jobs table so they survive restarts and can be shared by several API processes.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+import time
+import uuid
+
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+UNIQUE_VIOLATION = "23505"
+
+
+class JobRateLimited(Exception):
+    """Too many jobs submitted recently; retry_after is in seconds"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__("Too many requests, please try again shortly")
+        self.retry_after = retry_after
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class LocalJobStore:
+    """In-memory job store for one process"""
+    
+    def __init__(self, retention: float):
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: "deque[str]" = deque()
+    
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._prune()
+        self._jobs[job["id"]] = job
+        self._pending.append(job["id"])
+        return job
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+    
+    async def find_duplicate(self, user_key: str, kind: str, dedup_key: str, since: datetime) -> Optional[Dict[str, Any]]:
+        for job in reversed(self._jobs.values()):
+            if job["created_at"] < since:
+                break
+            if (job["user_key"], job["kind"], job["dedup_key"]) == (user_key, kind, dedup_key) and job["status"] != FAILED:
+                return job
+        return None
+    
+    async def count_recent(self, user_key: str, since: datetime) -> int:
+        count = 0
+        for job in reversed(self._jobs.values()):
+            if job["created_at"] < since:
+                break
+            count += job["user_key"] == user_key
+        return count
+    
+    async def claim(self, kind: str) -> Optional[Dict[str, Any]]:
+        for _ in range(len(self._pending)):
+            job = self._jobs.get(self._pending.popleft())
+            if job is None:
+                continue
+            if job["kind"] != kind:
+                self._pending.append(job["id"])
+                continue
+            job.update(status=RUNNING, started_at=_now(), attempts=job["attempts"] + 1)
+            return job
+        return None
+    
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(status=status, result=result, error=error, finished_at=_now())
+            # The payload (an image) is no longer needed once the job has run
+            job["payload"] = None
+    
+    def _prune(self) -> None:
+        """Drop finished jobs past the retention window (jobs are kept in creation order)"""
+        cutoff = _now() - timedelta(seconds=self.retention)
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["created_at"] >= cutoff or job["status"] in ACTIVE_STATUSES:
+                break
+            self._jobs.popitem(last=False)
+
+
+class SupabaseJobStore:
+    """Durable job store backed by the ai_jobs table"""
+    
+    COLUMNS = "id, user_key, kind, dedup_key, status, result, error, attempts, created_at, started_at, finished_at"
+    
+    def __init__(self, retention: float, stale_after: float, max_attempts: int):
+        from core.database import get_async_supabase_client
+        self.supabase = get_async_supabase_client()
+        self.retention = retention
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._last_prune = 0.0
+    
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        row = {k: v for k, v in job.items() if k in ("id", "user_key", "kind", "dedup_key", "status", "payload")}
+        try:
+            await self.supabase.table("ai_jobs").insert(row).execute()
+        except APIError as e:
+            # Lost a race with an identical submission: hand back the job that won
+            if e.code == UNIQUE_VIOLATION and job.get("dedup_key"):
+                duplicate = await self.find_duplicate(job["user_key"], job["kind"], job["dedup_key"], _now() - timedelta(seconds=self.retention))
+                if duplicate is not None:
+                    return duplicate
+            raise
+        return job
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            # PostgREST rejects a malformed uuid with an error (22P02); treat it as unknown
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        result = await self.supabase.table("ai_jobs").select(self.COLUMNS).eq("id", job_id).execute()
+        return result.data[0] if result.data else None
+    
+    async def find_duplicate(self, user_key: str, kind: str, dedup_key: str, since: datetime) -> Optional[Dict[str, Any]]:
+        result = await self.supabase.table("ai_jobs").select(self.COLUMNS) \
+            .eq("user_key", user_key).eq("kind", kind).eq("dedup_key", dedup_key) \
+            .neq("status", FAILED).gte("created_at", since.isoformat()) \
+            .order("created_at", desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+    
+    async def count_recent(self, user_key: str, since: datetime) -> int:
+        result = await self.supabase.table("ai_jobs").select("id", count="exact", head=True) \
+            .eq("user_key", user_key).gte("created_at", since.isoformat()).execute()
+        return result.count or 0
+    
+    async def claim(self, kind: str) -> Optional[Dict[str, Any]]:
+        await self._maybe_prune()
+        result = await self.supabase.rpc("claim_ai_job", {
+            "p_kind": kind,
+            "p_stale_seconds": int(self.stale_after),
+            "p_max_attempts": self.max_attempts
+        }).execute()
+        return result.data[0] if result.data else None
+    
+    async def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        await self.supabase.table("ai_jobs").update({
+            "status": status,
+            "result": result,
+            "error": error,
+            "payload": None,
+            "finished_at": _now().isoformat()
+        }).eq("id", job_id).execute()
+    
+    async def _maybe_prune(self) -> None:
+        """Delete finished jobs past the retention window, at most once a minute per process"""
+        if time.monotonic() - self._last_prune < 60:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = (_now() - timedelta(seconds=self.retention)).isoformat()
+        await self.supabase.table("ai_jobs").delete().in_("status", [SUCCEEDED, FAILED]).lt("finished_at", cutoff).execute()
+
+
+class _Subscriber:
+    """Output a job has produced since a streaming client subscribed"""
+    
+    def __init__(self):
+        self.chunks: List[Optional[str]] = []
+        self.ready = asyncio.Event()
+    
+    def push(self, chunk: Optional[str]) -> None:
+        self.chunks.append(chunk)
+        self.ready.set()
+    
+    def drain(self) -> List[Optional[str]]:
+        chunks, self.chunks = self.chunks, []
+        self.ready.clear()
+        return chunks
+
+
+class JobQueue:
+    """
+    Submit/poll queue for one kind of job. Submissions are deduplicated per user and
+    rate limited; a fixed number of workers run the handler, so a burst of submissions
+    waits in the queue instead of occupying API workers.
+    
+    The handler is a blocking call, handler(payload, emit), run on the queue's own thread
+    pool; text passed to emit is relayed to clients streaming the job from this process.
+    A call that outlives the timeout fails its job but keeps its worker until it returns,
+    so no more than `workers` handler calls ever run at once.
+    """
+    
+    def __init__(
+        self,
+        kind: str,
+        handler: Callable[[Dict[str, Any], Callable[[str], None]], Dict[str, Any]],
+        workers: int = 2,
+        timeout: float = 60.0,
+        rate_limit: int = 10,
+        rate_window: float = 60.0,
+        retention: float = 600.0,
+        poll_interval: float = 1.0,
+        store=None
+    ):
+        self.kind = kind
+        self.handler = handler
+        self.workers = workers
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.store = store or LocalJobStore(retention)
+        self._tasks = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        
+        # Streaming output of jobs running in this process
+        self._running: set = set()
+        self._partials: Dict[str, str] = {}
+        self._subscribers: Dict[str, List[_Subscriber]] = {}
+    
+    async def start(self) -> None:
+        """Start the worker pool (idempotent)"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.kind}-job")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} {self.kind} workers ({type(self.store).__name__})")
+    
+    async def stop(self) -> None:
+        """Cancel the workers; durable jobs they held are picked up again once stale"""
+        # The flag also stops a worker whose cancellation wait_for swallowed
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            # Handler calls cannot be interrupted; let any in flight finish in the background
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    async def submit(self, user_key: str, payload: Dict[str, Any], dedup_key: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job, or return the matching recent job for this user; raises JobRateLimited"""
+        await self.start()
+        now = _now()
+        
+        if dedup_key:
+            duplicate = await self.store.find_duplicate(user_key, self.kind, dedup_key, now - timedelta(seconds=self.retention))
+            if duplicate is not None:
+                return duplicate
+        
+        if await self.store.count_recent(user_key, now - timedelta(seconds=self.rate_window)) >= self.rate_limit:
+            raise JobRateLimited(int(self.rate_window))
+        
+        job = await self.store.create({
+            "id": str(uuid.uuid4()),
+            "user_key": user_key,
+            "kind": self.kind,
+            "dedup_key": dedup_key,
+            "status": QUEUED,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None
+        })
+        self._wakeup.set()
+        return job
+    
+    async def get(self, job_id: str, user_key: str) -> Optional[Dict[str, Any]]:
+        """A job, if it exists and belongs to user_key"""
+        job = await self.store.get(job_id)
+        if job is None or job["user_key"] != user_key:
+            return None
+        return job
+    
+    async def wait(self, job_id: str, user_key: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Poll until the job finishes or timeout passes, then return its latest state"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id, user_key)
+            if job is None or job["status"] not in ACTIVE_STATUSES or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(min(0.25, max(0.0, deadline - time.monotonic())))
+    
+    async def stream(self, job_id: str, user_key: str, timeout: float) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yield ("token", text) as the job produces output, then ("done", job) with its final
+        state (or None if it does not exist). Jobs running in another process produce no
+        tokens here; their result arrives with the done event.
+        """
+        deadline = time.monotonic() + timeout
+        subscriber = _Subscriber()
+        self._subscribers.setdefault(job_id, []).append(subscriber)
+        # Taken in the same step as subscribing, so nothing is missed or sent twice
+        produced = self._partials.get(job_id, "")
+        
+        try:
+            job = await self.get(job_id, user_key)
+            if job is None:
+                yield "done", None
+                return
+            
+            if produced:
+                yield "token", produced
+            
+            while job["status"] in ACTIVE_STATUSES and time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+                except asyncio.TimeoutError:
+                    pass
+                
+                woken = subscriber.ready.is_set()
+                finished = False
+                for chunk in subscriber.drain():
+                    if chunk is None:
+                        finished = True
+                    else:
+                        yield "token", chunk
+                
+                if finished or not woken:
+                    # Re-read on completion, and on timeouts in case another process ran the job
+                    job = await self.get(job_id, user_key) or job
+            
+            yield "done", job
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+    
+    def _publish(self, job_id: str, chunk: Optional[str]) -> None:
+        """Relay output to streaming clients; None marks the end of the job"""
+        if chunk is None:
+            self._running.discard(job_id)
+            self._partials.pop(job_id, None)
+        elif job_id not in self._running:
+            # Late output from a handler thread that outlived its timeout
+            return
+        else:
+            self._partials[job_id] = self._partials.get(job_id, "") + chunk
+        for subscriber in self._subscribers.get(job_id, []):
+            subscriber.push(chunk)
+    
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            try:
+                job = await self.store.claim(self.kind)
+            except Exception as e:
+                logger.error(f"{self.kind} worker {index}: claim failed: {e}")
+                job = None
+            
+            if job is None:
+                # Woken early by local submissions; durable stores are also polled for other processes' jobs
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self._run(job)
+    
+    async def _run(self, job: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        self._running.add(job["id"])
+        
+        def emit(chunk: str) -> None:
+            loop.call_soon_threadsafe(self._publish, job["id"], chunk)
+        
+        call = loop.run_in_executor(self._executor, self.handler, job["payload"], emit)
+        try:
+            # Shielded: a timeout must not detach us from a thread that is still running
+            result = await asyncio.wait_for(asyncio.shield(call), timeout=self.timeout)
+            await self.store.finish(job["id"], SUCCEEDED, result=result)
+            logger.info(f"{self.kind} job {job['id']} succeeded in {time.perf_counter() - started:.2f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = "Timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error(f"{self.kind} job {job['id']} failed: {error}")
+            try:
+                await self.store.finish(job["id"], FAILED, error=error)
+            except Exception as finish_error:
+                logger.error(f"{self.kind} job {job['id']}: could not record failure: {finish_error}")
+        finally:
+            self._publish(job["id"], None)
+        
+        if not call.done():
+            # Hold this worker's slot until the abandoned call returns
+            await asyncio.wait({call})
+            logger.warning(f"{self.kind} job {job['id']}: handler returned after {time.perf_counter() - started:.2f}s, past its timeout")
@@ -0,0 +1,52 @@
+"""
+Child ownership checks shared by the child-scoped services
+"""
+
+from typing import Any, Dict, Iterable
+import logging
+
+from .config import settings
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Columns callers need from an owned child; keep this narrow
+CHILD_COLUMNS = "id, nickname"
+
+# Children keyed by ID, per parent user ID
+_children_cache = TTLCache("child_ownership", maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.OWNERSHIP_CACHE_TTL)
+
+
+async def _load_owned_children(supabase, user_id: str) -> Dict[str, Dict[str, Any]]:
+    """Read a parent's children and refresh the cache"""
+    result = await supabase.table("children").select(CHILD_COLUMNS).eq("parent_user_id", user_id).execute()
+    children = {child["id"]: child for child in result.data}
+    _children_cache.set(user_id, children)
+    return children
+
+
+async def get_owned_children(supabase, user_id: str, child_ids: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    Children of a parent keyed by child ID, cached per user. If any of child_ids is missing
+    from the cached set it is re-read once, as it may predate a child added through another worker.
+    """
+    children = _children_cache.get(user_id)
+    if children is None or any(str(child_id) not in children for child_id in child_ids):
+        children = await _load_owned_children(supabase, user_id)
+    return children
+
+
+async def get_owned_child(supabase, child_id: str, user_id: str) -> Dict[str, Any]:
+    """Get a child of the parent, or raise ValueError if it is not theirs"""
+    child_id = str(child_id)
+    child = (await get_owned_children(supabase, user_id, [child_id])).get(child_id)
+    
+    if child is None:
+        raise ValueError("Child not found or access denied")
+    
+    return child
+
+
+def invalidate_owned_children(user_id: str) -> None:
+    """Drop a parent's cached children, e.g. after one is added or edited"""
+    _children_cache.invalidate(user_id)
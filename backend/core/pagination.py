@@ -0,0 +1,60 @@
+"""
+Keyset pagination over (created_at, id), newest first
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+import uuid
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past a row"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Optional[str]]:
+    """(created_at, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Both values end up inside a PostgREST filter, so only accept well-formed ones
+        return _validate_timestamp(created_at), str(uuid.UUID(row_id))
+    except (ValueError, TypeError, AttributeError):
+        pass
+    
+    # Older clients still send the bare created_at of the last row
+    return _validate_timestamp(cursor), None
+
+
+def _validate_timestamp(value: str) -> str:
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return value
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def apply_keyset(query, cursor: Optional[str], limit: int):
+    """Order newest first and fetch one row past the page, starting after the cursor"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if row_id is None:
+            query = query.lt("created_at", created_at)
+        else:
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+            )
+    
+    return query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def keyset_page(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+    """Trim the probe row and return (rows, next_cursor, has_more)"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]) if has_more and rows else None
+    return rows, next_cursor, has_more
@@ -0,0 +1,114 @@
+"""
+Streaming reads of multipart uploads: size-capped, hashed and type-checked chunk by chunk
+"""
+
+from typing import BinaryIO, Collection, Optional
+from io import BufferedReader
+import hashlib
+import logging
+
+from fastapi import UploadFile
+
+from core.config import settings
+from core.images import sniff_image_type
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/heic")
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+    "image/bmp": "bmp"
+}
+
+
+class UploadError(ValueError):
+    """Upload rejected while reading; carries the HTTP status to answer with"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BufferedUpload:
+    """
+    A validated upload. The content stays in the file Starlette already spooled it to
+    (in memory when small, on disk past 1MB); nothing is copied here.
+    Use as a context manager so the file is closed.
+    """
+    
+    def __init__(self, filename: Optional[str], content_type: str, size: int, sha256: str, file: BinaryIO):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self._file = file
+    
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS.get(self.content_type, "bin")
+    
+    def open(self) -> BinaryIO:
+        """The upload's file, rewound to the start"""
+        self._file.seek(0)
+        return self._file
+    
+    def payload(self) -> BufferedReader:
+        """Body for Supabase Storage, which accepts buffered readers; reads the spooled file in place"""
+        self._file.seek(0)
+        return BufferedReader(self._file)
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __enter__(self) -> "BufferedUpload":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+async def read_upload(
+    upload: UploadFile,
+    allowed_types: Optional[Collection[str]] = None,
+    max_size: Optional[int] = None
+) -> BufferedUpload:
+    """
+    Read an upload in chunks, rejecting it as soon as it passes max_size or its signature
+    is not one of allowed_types. The content type is sniffed, not taken from the client.
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+    if upload.size is not None and upload.size > max_size:
+        raise UploadError(f"File size too large (max {max_size // (1024 * 1024)}MB)", 413)
+    
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        
+        size += len(chunk)
+        if size > max_size:
+            raise UploadError(f"File size too large (max {max_size // (1024 * 1024)}MB)", 413)
+        
+        if content_type is None:
+            content_type = sniff_image_type(chunk) or "application/octet-stream"
+            if allowed_types is not None and content_type not in allowed_types:
+                raise UploadError("Unsupported file type", 415)
+        
+        digest.update(chunk)
+    
+    if size == 0:
+        raise UploadError("Empty file")
+    
+    # Hand on the already-spooled file rather than a second copy of it
+    await upload.seek(0)
+    return BufferedUpload(upload.filename, content_type, size, digest.hexdigest(), upload.file)
@@ -22,9 +22,25 @@ CREATE TABLE public.activity_progress (
   notes text,
   completed_at timestamp with time zone DEFAULT now(),
   CONSTRAINT activity_progress_pkey PRIMARY KEY (id),
+  CONSTRAINT activity_progress_child_id_activity_id_key UNIQUE (child_id, activity_id),
   CONSTRAINT activity_progress_child_id_fkey FOREIGN KEY (child_id) REFERENCES public.children(id),
   CONSTRAINT activity_progress_activity_id_fkey FOREIGN KEY (activity_id) REFERENCES public.activities(id)
 );
+CREATE TABLE public.ai_jobs (
+  id uuid NOT NULL DEFAULT gen_random_uuid(),
+  user_key text NOT NULL,
+  kind text NOT NULL,
+  dedup_key text,
+  status text NOT NULL DEFAULT 'queued'::text CHECK (status = ANY (ARRAY['queued'::text, 'running'::text, 'succeeded'::text, 'failed'::text])),
+  payload jsonb,
+  result jsonb,
+  error text,
+  attempts integer NOT NULL DEFAULT 0,
+  created_at timestamp with time zone NOT NULL DEFAULT now(),
+  started_at timestamp with time zone,
+  finished_at timestamp with time zone,
+  CONSTRAINT ai_jobs_pkey PRIMARY KEY (id)
+);
 CREATE TABLE public.badges (
   id uuid NOT NULL DEFAULT gen_random_uuid(),
   name text NOT NULL,
@@ -161,11 +177,27 @@ CREATE TABLE public.kpi_metrics (
   CONSTRAINT kpi_metrics_pkey PRIMARY KEY (child_id, metric, period_start),
   CONSTRAINT kpi_metrics_child_id_fkey FOREIGN KEY (child_id) REFERENCES public.children(id)
 );
+CREATE TABLE public.kpi_rollup_state (
+  name text NOT NULL,
+  watermark timestamp with time zone NOT NULL,
+  CONSTRAINT kpi_rollup_state_pkey PRIMARY KEY (name)
+);
+CREATE TABLE public.leaderboard_scores (
+  period_start date NOT NULL,
+  period_end date,
+  child_id uuid NOT NULL,
+  score integer NOT NULL DEFAULT 0,
+  rank integer,
+  percentile numeric,
+  CONSTRAINT leaderboard_scores_pkey PRIMARY KEY (period_start, child_id),
+  CONSTRAINT leaderboard_scores_child_id_fkey FOREIGN KEY (child_id) REFERENCES public.children(id)
+);
 CREATE TABLE public.leaderboards (
   period_start date NOT NULL,
   period_end date,
   class_id uuid NOT NULL,
   child_id uuid NOT NULL,
+  score integer NOT NULL DEFAULT 0,
   rank integer,
   percentile numeric,
   CONSTRAINT leaderboards_pkey PRIMARY KEY (period_start, class_id, child_id),
@@ -210,6 +242,8 @@ CREATE TABLE public.posts (
   content text,
   media jsonb DEFAULT '[]'::jsonb,
   anonymous boolean DEFAULT false,
+  likes_count integer NOT NULL DEFAULT 0,
+  comments_count integer NOT NULL DEFAULT 0,
   created_at timestamp with time zone DEFAULT now(),
   CONSTRAINT posts_pkey PRIMARY KEY (id),
   CONSTRAINT posts_class_id_fkey FOREIGN KEY (class_id) REFERENCES public.classes(id),
@@ -294,6 +328,13 @@ CREATE TABLE public.token_accounts (
   CONSTRAINT token_accounts_pkey PRIMARY KEY (child_id),
   CONSTRAINT token_accounts_child_id_fkey FOREIGN KEY (child_id) REFERENCES public.children(id)
 );
+CREATE TABLE public.token_balance_snapshots (
+  account_id uuid NOT NULL,
+  as_of timestamp with time zone NOT NULL,
+  balance integer NOT NULL,
+  CONSTRAINT token_balance_snapshots_pkey PRIMARY KEY (account_id, as_of),
+  CONSTRAINT token_balance_snapshots_account_id_fkey FOREIGN KEY (account_id) REFERENCES public.token_accounts(child_id)
+);
 CREATE TABLE public.token_transactions (
   id uuid NOT NULL DEFAULT gen_random_uuid(),
   account_id uuid,
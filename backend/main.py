@@ -5,6 +5,7 @@ Microservices architecture with single Supabase database
 
 import sys
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Add the current directory to Python path
@@ -34,7 +35,20 @@ from services.camera.router import router as camera_router
 
 # Import shared dependencies
 from core.config import settings
-from core.database import get_supabase_client
+from core.database import db_manager
+from core.cache import get_cache_stats
+from core.http_client import get_http_client_stats, close_http_clients
+from core.images import get_image_stats
+from services.ai.service import explain_jobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background job workers; stop them and release pooled upstream connections on shutdown"""
+    await explain_jobs.start()
+    yield
+    await explain_jobs.stop()
+    await close_http_clients()
 
 # Create FastAPI app
 app = FastAPI(
@@ -43,6 +57,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -60,6 +75,25 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "project-reach-api"}
 
+@app.get("/health/db")
+async def database_health_check():
+    """Database connectivity and query pool metrics"""
+    healthy = await db_manager.health_check()
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "pool": db_manager.get_pool_metrics()
+    }
+
+@app.get("/health/cache")
+async def cache_health_check():
+    """Hit/miss counters for in-process caches"""
+    return {"caches": get_cache_stats()}
+
+@app.get("/health/upstream")
+async def upstream_health_check():
+    """Concurrency and retry counters for pooled model API clients"""
+    return {"clients": get_http_client_stats(), "images": get_image_stats()}
+
 # API v1 routes
 API_V1_PREFIX = "/api/v1"
 
@@ -136,4 +136,14 @@ class ProgressUpdateRequest(BaseModel):
 
 class BulkProgressRequest(BaseModel):
     """Request to update multiple activities"""
-    updates: List[ProgressUpdateRequest]
\ No newline at end of file
+    updates: List[ProgressUpdateRequest]
+
+
+class BulkProgressResult(BaseModel):
+    """Outcome of one entry in a bulk progress update"""
+    index: int
+    child_id: UUIDField
+    activity_id: UUIDField
+    success: bool
+    progress: Optional[ActivityProgress] = None
+    error: Optional[str] = None
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild token balance snapshots from the token_transactions ledger.
+Accounts are processed in batches, so this is safe to run on a live database.
+
+Usage: python rebuild_token_balances.py [--batch-size 500] [--roll]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from core.config import settings
+from services.tokens.service import TokensService
+
+
+async def run(batch_size: int, roll: bool) -> None:
+    service = TokensService()
+    
+    if roll:
+        print("🔄 Rolling weekly token balance snapshots...")
+        rolled = await service.roll_balance_snapshots()
+        print(f"✅ {rolled} accounts snapshotted")
+        return
+    
+    print(f"🔧 Rebuilding token balance snapshots in batches of {batch_size}...")
+    started = time.perf_counter()
+    rebuilt = await service.rebuild_balance_snapshots(batch_size)
+    print(f"✅ Rebuilt {rebuilt} accounts in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild token balance snapshots from the ledger")
+    parser.add_argument("--batch-size", type=int, default=settings.TOKEN_REBUILD_BATCH_SIZE, help="Accounts per batch")
+    parser.add_argument("--roll", action="store_true", help="Only run the weekly rollover instead of a full rebuild")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.batch_size, args.roll))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
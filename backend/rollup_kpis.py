@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Materialize weekly KPI metrics from activity progress and the token ledger.
+By default only children touched since the last run are recomputed; schedule it
+every few minutes. Use --full to backfill every child over the last N weeks.
+
+Usage: python rollup_kpis.py [--full --weeks 12 --batch-size 200]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from core.config import settings
+from services.analytics.service import AnalyticsService
+
+
+async def run(full: bool, weeks: int, batch_size: int) -> None:
+    service = AnalyticsService()
+    started = time.perf_counter()
+    
+    if full:
+        print(f"📊 Rolling up {weeks} weeks of KPIs for all children in batches of {batch_size}...")
+        written = await service.rollup_kpis(weeks, batch_size)
+    else:
+        print("📊 Rolling up KPIs changed since the last run...")
+        written = await service.rollup_recent_kpis()
+    
+    print(f"✅ {written} metric rows written in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up weekly KPI metrics")
+    parser.add_argument("--full", action="store_true", help="Recompute every child instead of only recent changes")
+    parser.add_argument("--weeks", type=int, default=1, help="Weeks to recompute with --full")
+    parser.add_argument("--batch-size", type=int, default=settings.KPI_ROLLUP_BATCH_SIZE, help="Children per batch with --full")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.full, args.weeks, args.batch_size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -84,6 +84,10 @@ BEGIN
 
     -- Add token transactions
     INSERT INTO token_transactions (account_id, delta, reason, ref_table, ref_id, actor_id, created_at) VALUES
+    -- Opening balances, so the ledger adds up to the account balances above
+    (child1_id, 90, 'adjustment', 'token_accounts', NULL, NULL, NOW() - INTERVAL '30 days'),
+    (child2_id, 140, 'adjustment', 'token_accounts', NULL, NULL, NOW() - INTERVAL '30 days'),
+    
     -- Emma's transactions
     (child1_id, 15, 'activity_complete', 'activities', '880e8400-e29b-41d4-a716-446655440001', sample_user_id, NOW() - INTERVAL '2 days'),
     (child1_id, 20, 'weekly_goal', NULL, NULL, sample_user_id, NOW() - INTERVAL '1 day'),
@@ -103,12 +107,14 @@ BEGIN
 
     RAISE NOTICE '✅ Game instances created';
 
-    -- Add some leaderboard entries
-    INSERT INTO leaderboards (period_start, period_end, class_id, child_id, rank, percentile) VALUES
-    (CURRENT_DATE - INTERVAL '7 days', CURRENT_DATE, class1_id, child1_id, 3, 75.5),
-    (CURRENT_DATE - INTERVAL '7 days', CURRENT_DATE, class2_id, child2_id, 5, 65.0);
+    -- Leaderboards are filled from the ledger by a trigger; recompute the weeks the
+    -- transactions above fall in so existing rows are corrected rather than duplicated
+    PERFORM recompute_class_leaderboards(week_start, ARRAY[class1_id, class2_id]),
+            recompute_global_leaderboard(week_start)
+       FROM (VALUES (date_trunc('week', NOW() - INTERVAL '3 days')::date),
+                    (date_trunc('week', NOW())::date)) AS weeks(week_start);
 
-    RAISE NOTICE '✅ Leaderboard entries added';
+    RAISE NOTICE '✅ Leaderboard entries computed';
 
     RAISE NOTICE '';
     RAISE NOTICE '🎉 Sample data insertion completed successfully!';
@@ -122,7 +128,7 @@ BEGIN
     RAISE NOTICE '  💰 Token Transactions: 6 transactions';
     RAISE NOTICE '  📊 KPI Metrics: 8 metrics';
     RAISE NOTICE '  🎮 Game Instances: 2 active games';
-    RAISE NOTICE '  🏆 Leaderboard: 2 entries';
+    RAISE NOTICE '  🏆 Leaderboard: recomputed for the seeded weeks';
     RAISE NOTICE '';
     RAISE NOTICE '✨ You should now see actual data in your app instead of N/A values!';
     RAISE NOTICE '';
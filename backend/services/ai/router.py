@@ -1,10 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import json
 import logging
 from typing import Optional
 
-from core.auth import get_current_user
-from .service import qwen_service
+from core.auth import get_current_user, get_optional_user, AuthUser
+from core.config import settings
+from core.jobs import JobRateLimited, SUCCEEDED, FAILED
+from .service import explain_jobs, submit_explain_job
 
 logger = logging.getLogger(__name__)
 
@@ -17,29 +21,145 @@ class ExplainScreenshotResponse(BaseModel):
     explanation: str
     success: bool
 
+class ExplainJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded or failed
+    explanation: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _user_key(user: Optional[AuthUser], request: Optional[Request] = None) -> str:
+    """Rate-limit and ownership key: the user, or the client address on the legacy endpoint where auth is optional"""
+    if user is not None:
+        return f"user:{user.user_id}"
+    return f"ip:{request.client.host if request and request.client else 'unknown'}"
+
+
+def _job_response(job: dict) -> ExplainJobResponse:
+    return ExplainJobResponse(
+        job_id=str(job["id"]),
+        status=job["status"],
+        explanation=(job.get("result") or {}).get("explanation"),
+        error=job.get("error")
+    )
+
+
+async def _submit(request_body: ExplainScreenshotRequest, user_key: str) -> dict:
+    """Queue a job, mapping bad input to 400 and rate limiting to 429"""
+    if not request_body.image_data:
+        raise HTTPException(status_code=400, detail="No image data provided")
+    
+    try:
+        return await submit_explain_job(request_body.image_data, user_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
+    except JobRateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+@router.post("/explain-screenshot/jobs", response_model=ExplainJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_explain_screenshot_job(
+    request: ExplainScreenshotRequest,
+    current_user: AuthUser = Depends(get_current_user)
+):
+    """
+    Queue a screenshot explanation and return its job id to poll.
+    Resubmitting the same image returns the existing job.
+    """
+    job = await _submit(request, _user_key(current_user))
+    return _job_response(job)
+
+
+@router.get("/explain-screenshot/jobs/{job_id}", response_model=ExplainJobResponse)
+async def get_explain_screenshot_job(
+    job_id: str,
+    current_user: AuthUser = Depends(get_current_user)
+):
+    """Poll a screenshot explanation job"""
+    job = await explain_jobs.get(job_id, _user_key(current_user))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/explain-screenshot/stream")
+async def stream_explain_screenshot(
+    request: ExplainScreenshotRequest,
+    current_user: AuthUser = Depends(get_current_user)
+):
+    """
+    Queue a screenshot explanation and relay it as Server-Sent Events while it is generated:
+        
+        event: job    {"job_id", "status"}
+        event: token  {"text"}            (repeated; concatenate in order)
+        event: done   {"explanation", "success": true}
+        event: error  {"detail"}
+    
+    The done event always carries the full explanation, so clients that missed tokens
+    (e.g. a resubmitted image answered from an earlier job) still get the whole text.
+    """
+    user_key = _user_key(current_user)
+    # Bad input and rate limiting fail with a normal HTTP error before the stream starts
+    job = await _submit(request, user_key)
+    job_id = str(job["id"])
+    
+    async def events():
+        yield _sse("job", {"job_id": job_id, "status": job["status"]})
+        async for kind, value in explain_jobs.stream(job_id, user_key, settings.ai_job_wait_timeout):
+            if kind == "token":
+                yield _sse("token", {"text": value})
+            elif value is not None and value["status"] == SUCCEEDED:
+                yield _sse("done", {"explanation": value["result"]["explanation"], "success": True})
+            elif value is not None and value["status"] == FAILED:
+                yield _sse("error", {"detail": f"AI processing failed: {value['error']}"})
+            else:
+                yield _sse("error", {"detail": f"Explanation is still being generated; poll /ai/explain-screenshot/jobs/{job_id}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/explain-screenshot", response_model=ExplainScreenshotResponse)
 async def explain_screenshot(
     request: ExplainScreenshotRequest,
+    http_request: Request,
     # TODO: Re-enable authentication after fixing Supabase JWT validation
-    # current_user=Depends(get_current_user)
+    current_user: Optional[AuthUser] = Depends(get_optional_user)
 ):
     """
     Analyze a screenshot using Qwen2.5-VL and provide an explanation
     
+    Kept for clients that expect the explanation in the response: the work goes through
+    the job queue like /explain-screenshot/jobs, and this waits for it to finish.
+    
     Note: Authentication temporarily disabled for AI feature testing
     """
     try:
         logger.info(f"🔍 Processing screenshot explanation request (auth disabled for testing)")
-        
-        if not request.image_data:
-            raise HTTPException(status_code=400, detail="No image data provided")
-        
-        # Process the screenshot with AI
         logger.info(f"📸 Processing image data (length: {len(request.image_data)})")
         
-        explanation = qwen_service.explain_screenshot(
-            base64_image=request.image_data
-        )
+        user_key = _user_key(current_user, http_request)
+        job = await _submit(request, user_key)
+        job = await explain_jobs.wait(str(job["id"]), user_key, settings.ai_job_wait_timeout)
+        
+        if job is None or job["status"] == FAILED:
+            raise Exception(job["error"] if job else "Job disappeared")
+        if job["status"] != SUCCEEDED:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Explanation is still being generated; poll /ai/explain-screenshot/jobs/{job['id']}"
+            )
+        explanation = job["result"]["explanation"]
         
         logger.info("✅ Screenshot explanation generated successfully")
         logger.info(f"📝 Explanation length: {len(explanation)} characters")
@@ -48,7 +168,10 @@ async def explain_screenshot(
             explanation=explanation,
             success=True
         )
-        
+    
+    except HTTPException:
+        raise
+    
     except ValueError as e:
         logger.error(f"❌ Invalid input data: {str(e)}")
         logger.error(f"🔍 Input data preview: {request.image_data[:100]}...")
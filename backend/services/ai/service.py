@@ -1,8 +1,13 @@
 import os
 import base64
+import asyncio
+import hashlib
 import logging
+from typing import Any, Callable, Dict, Optional
 from huggingface_hub import InferenceClient
 from core.config import settings
+from core.images import decode_base64_image, prepare_image, prepare_image_data
+from core.jobs import JobQueue, SupabaseJobStore
 
 logger = logging.getLogger(__name__)
 
@@ -33,24 +38,14 @@ class QwenVLService:
             
             self._initialized = True
             logger.info("Hugging Face Inference Client initialized successfully")
-            
+        
         except Exception as e:
             logger.error(f"Failed to initialize Hugging Face client: {str(e)}")
             raise
     
     def _base64_to_data_url(self, base64_string: str) -> str:
-        """Convert base64 string to data URL format"""
-        try:
-            # Remove data URL prefix if present
-            if base64_string.startswith('data:'):
-                return base64_string
-            
-            # Add data URL prefix for JPEG (most common screenshot format)
-            return f"data:image/jpeg;base64,{base64_string}"
-            
-        except Exception as e:
-            logger.error(f"Failed to process base64 image: {str(e)}")
-            raise ValueError("Invalid base64 image data")
+        """Convert base64 string to a data URL, downscaled and with its real MIME type"""
+        return prepare_image(base64_string)["data_url"]
     
     def explain_screenshot(self, base64_image: str) -> str:
         """
@@ -58,7 +53,21 @@ class QwenVLService:
         
         Args:
             base64_image: Base64 encoded image data
-            
+        
+        Returns:
+            Generated explanation text
+        """
+        return self.explain_image_url(self._base64_to_data_url(base64_image))
+    
+    def explain_image_url(self, image_url: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Process an image data URL with Qwen2.5-VL model to generate explanation
+        
+        Args:
+            image_url: Data URL of the (already downscaled) image
+            on_token: If given, the completion is streamed and each text delta is passed
+                to it as it arrives
+        
         Returns:
             Generated explanation text
         """
@@ -66,9 +75,6 @@ class QwenVLService:
             # Initialize client if not already done
             self._initialize_client()
             
-            # Convert base64 to data URL
-            image_url = self._base64_to_data_url(base64_image)
-            
             # Fixed prompt - NOT taken from user, hardcoded for Hugging Face API
             prompt = "You are helping out inside an app made for parents/guardian engagement in early childhood education. Analyze the visual elements as well as text in the image and give an explanation for the guardian. You may be given a screenshot of any page inside the app in which case describe what can be done through the current view and what features are available and how to see other tabs to avail other services. You may alternatively be given an image of an exercise for the child, in which case, explain what the goal of the activity is and how the guardian can help the child complete it. Keep your reply to the point and conversational and easy to understand. Talk to the guardian directly."
             
@@ -96,23 +102,75 @@ class QwenVLService:
             logger.info(f"📸 Image URL length: {len(image_url)} characters")
             logger.info(f"💬 Prompt: {prompt}")
             
-            completion = self.client.chat.completions.create(
-                model="Qwen/Qwen2.5-VL-7B-Instruct",
-                messages=messages,
-                max_tokens=512,
-                temperature=0.7
-            )
+            if on_token is None:
+                completion = self.client.chat.completions.create(
+                    model="Qwen/Qwen2.5-VL-7B-Instruct",
+                    messages=messages,
+                    max_tokens=512,
+                    temperature=0.7
+                )
+                explanation = completion.choices[0].message.content
+            else:
+                parts = []
+                for chunk in self.client.chat.completions.create(
+                    model="Qwen/Qwen2.5-VL-7B-Instruct",
+                    messages=messages,
+                    max_tokens=512,
+                    temperature=0.7,
+                    stream=True
+                ):
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+                explanation = "".join(parts)
             
-            explanation = completion.choices[0].message.content
             logger.info(f"✅ Successfully generated explanation via Hugging Face API")
             logger.info(f"📝 Response length: {len(explanation)} characters")
             logger.info(f"🔍 Response preview: {explanation[:100]}...")
             
             return explanation or "No explanation generated"
-            
+        
         except Exception as e:
             logger.error(f"Failed to explain screenshot: {str(e)}")
             raise
 
 # Global instance
 qwen_service = QwenVLService()
+
+
+def _run_explain_job(payload: Dict[str, Any], emit: Callable[[str], None]) -> Dict[str, Any]:
+    """Worker handler, run on the queue's thread pool (the HF client is blocking), streaming tokens to emit"""
+    explanation = qwen_service.explain_image_url(payload["image_url"], emit)
+    return {"explanation": explanation}
+
+
+explain_jobs = JobQueue(
+    "explain_screenshot",
+    _run_explain_job,
+    workers=settings.AI_JOB_WORKERS,
+    timeout=settings.AI_JOB_TIMEOUT,
+    rate_limit=settings.AI_JOB_RATE_LIMIT,
+    rate_window=settings.AI_JOB_RATE_WINDOW,
+    retention=settings.AI_JOB_RETENTION,
+    poll_interval=settings.AI_JOB_POLL_INTERVAL,
+    store=SupabaseJobStore(
+        settings.AI_JOB_RETENTION,
+        stale_after=settings.AI_JOB_TIMEOUT * 2,
+        max_attempts=settings.AI_JOB_MAX_ATTEMPTS
+    ) if settings.AI_JOB_STORE == "supabase" else None
+)
+
+
+async def submit_explain_job(base64_image: str, user_key: str) -> Dict[str, Any]:
+    """
+    Queue a screenshot explanation. The same image from the same user within the
+    retention window returns the existing job. Raises ValueError for bad image data
+    and JobRateLimited when the user is over their limit.
+    """
+    image_bytes = decode_base64_image(base64_image)
+    dedup_key = hashlib.sha256(image_bytes).hexdigest()
+    
+    # Downscale before queueing so the stored payload is small
+    image = await asyncio.to_thread(prepare_image_data, image_bytes)
+    return await explain_jobs.submit(user_key, {"image_url": image["data_url"]}, dedup_key=dedup_key)
@@ -4,9 +4,10 @@ Analytics microservice router
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Optional
+from datetime import date
 import logging
 
-from core.auth import get_current_user, get_current_parent, AuthUser
+from core.auth import get_current_user, get_current_parent, get_current_admin, AuthUser
 from .service import AnalyticsService
 
 logger = logging.getLogger(__name__)
@@ -74,4 +75,41 @@ async def get_leaderboard(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve leaderboard"
-        ) 
\ No newline at end of file
+        )
+
+
+@router.post("/admin/recompute-leaderboards")
+async def recompute_leaderboards(
+    period_start: Optional[date] = Query(None, description="Week to recompute (defaults to the current week)"),
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Rebuild class and global leaderboards from the token ledger"""
+    try:
+        service = AnalyticsService()
+        result = await service.recompute_leaderboards(period_start)
+        return {"message": "Leaderboards recomputed", "data": result}
+    except Exception as e:
+        logger.error(f"Failed to recompute leaderboards: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to recompute leaderboards"
+        )
+
+
+@router.post("/admin/rollup-kpis")
+async def rollup_kpis(
+    full: bool = Query(False, description="Recompute every child instead of only recent changes"),
+    weeks: int = Query(1, ge=1, le=52, description="Weeks to recompute in a full rollup"),
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Materialize weekly KPI metrics from activity progress and the token ledger"""
+    try:
+        service = AnalyticsService()
+        written = await service.rollup_kpis(weeks) if full else await service.rollup_recent_kpis()
+        return {"message": "KPI rollup complete", "data": {"rows_written": written}}
+    except Exception as e:
+        logger.error(f"Failed to roll up KPIs: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to roll up KPIs"
+        )
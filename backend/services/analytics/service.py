@@ -4,19 +4,29 @@ Business logic for performance metrics, KPIs, and analytics data
 """
 
 from typing import List, Dict, Any, Optional
+import asyncio
 import logging
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 
-from core.database import get_supabase_client
+from core.cache import TTLCache
+from core.config import settings
+from core.database import get_async_supabase_client
+from core.ownership import get_owned_child, get_owned_children
 
 logger = logging.getLogger(__name__)
 
+# KPI metrics shown on the home dashboard
+DASHBOARD_METRICS = ['reading_minutes', 'activities_completed', 'streak_days', 'weekly_progress']
+
+# Dashboard metrics keyed by (parent user ID, child ID or None for all children)
+_metrics_cache = TTLCache("performance_metrics", maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.METRICS_CACHE_TTL)
+
 
 class AnalyticsService:
     """Service for analytics and performance metrics"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.supabase = get_async_supabase_client()
     
     async def get_performance_metrics(self, user_id: str, child_id: Optional[str] = None) -> Dict[str, Any]:
         """Get performance metrics for a user's children"""
@@ -25,14 +35,11 @@ class AnalyticsService:
             children_filter = []
             if child_id:
                 # Verify child belongs to user
-                result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-                if not result.data:
-                    raise ValueError("Child not found or access denied")
+                await get_owned_child(self.supabase, child_id, user_id)
                 children_filter = [child_id]
             else:
                 # Get all children for the user
-                result = self.supabase.table("children").select("id").eq("parent_user_id", user_id).execute()
-                children_filter = [child['id'] for child in result.data]
+                children_filter = list(await get_owned_children(self.supabase, user_id))
             
             if not children_filter:
                 return {
@@ -45,36 +52,42 @@ class AnalyticsService:
                     "badges_earned": 0
                 }
             
-            metrics = {}
+            cache_key = (user_id, child_id)
+            cached = _metrics_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
             
-            # Get latest metrics for the children
-            for metric_name in ['reading_minutes', 'activities_completed', 'streak_days', 'weekly_progress']:
-                result = self.supabase.table("kpi_metrics").select("value_num").eq("metric", metric_name).in_("child_id", children_filter).order("period_start", desc=True).limit(len(children_filter)).execute()
-                
-                if result.data:
-                    # Sum up values for all children
-                    total_value = sum(float(row['value_num']) for row in result.data)
-                    if metric_name == 'weekly_progress':
-                        # Average for percentage metrics
-                        metrics[metric_name] = round(total_value / len(result.data), 1) if result.data else 0.0
-                    else:
-                        metrics[metric_name] = int(total_value) if metric_name != 'weekly_progress' else total_value
+            # Latest value per (child, metric) plus the totals, fetched together
+            latest_result, token_result, cert_result, badge_result = await asyncio.gather(
+                self.supabase.rpc("latest_kpi_metrics", {
+                    "p_child_ids": children_filter,
+                    "p_metrics": DASHBOARD_METRICS
+                }).execute(),
+                self.supabase.rpc("token_balances", {"p_child_ids": children_filter}).execute(),
+                self.supabase.table("child_certificates").select("certificate_id", count="exact", head=True).in_("child_id", children_filter).execute(),
+                self.supabase.table("child_badges").select("badge_id", count="exact", head=True).in_("child_id", children_filter).execute()
+            )
+            
+            values_by_metric = {metric_name: [] for metric_name in DASHBOARD_METRICS}
+            for row in latest_result.data or []:
+                values_by_metric[row['metric']].append(float(row['value_num'] or 0))
+            
+            metrics = {}
+            for metric_name, values in values_by_metric.items():
+                if metric_name == 'weekly_progress':
+                    # Average for percentage metrics
+                    metrics[metric_name] = round(sum(values) / len(values), 1) if values else 0.0
                 else:
-                    metrics[metric_name] = 0 if metric_name != 'weekly_progress' else 0.0
+                    # Sum up values for all children
+                    metrics[metric_name] = int(sum(values))
             
-            # Get token balances
-            token_result = self.supabase.table("token_accounts").select("balance").in_("child_id", children_filter).execute()
             metrics['total_tokens'] = sum(int(row['balance']) for row in token_result.data) if token_result.data else 0
+            metrics['certificates_earned'] = cert_result.count or 0
+            metrics['badges_earned'] = badge_result.count or 0
             
-            # Get certificates count
-            cert_result = self.supabase.table("child_certificates").select("certificate_id").in_("child_id", children_filter).execute()
-            metrics['certificates_earned'] = len(cert_result.data) if cert_result.data else 0
-            
-            # Get badges count
-            badge_result = self.supabase.table("child_badges").select("badge_id").in_("child_id", children_filter).execute()
-            metrics['badges_earned'] = len(badge_result.data) if badge_result.data else 0
+            _metrics_cache.set(cache_key, metrics)
             
-            return metrics
+            return dict(metrics)
             
         except Exception as e:
             logger.error(f"Failed to get performance metrics: {e}")
@@ -84,14 +97,10 @@ class AnalyticsService:
         """Get achievements for a specific child"""
         try:
             # Verify child belongs to user
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
-                raise ValueError("Child not found or access denied")
-            
-            child = result.data[0]
+            child = await get_owned_child(self.supabase, child_id, user_id)
             
             # Get badges
-            badges_result = self.supabase.table("child_badges").select("""
+            badges_result = await self.supabase.table("child_badges").select("""
                 badge_id, awarded_at,
                 badges(name, icon_url)
             """).eq("child_id", child_id).execute()
@@ -107,7 +116,7 @@ class AnalyticsService:
                 })
             
             # Get certificates
-            cert_result = self.supabase.table("child_certificates").select("""
+            cert_result = await self.supabase.table("child_certificates").select("""
                 certificate_id, awarded_at,
                 certificates(title, description, image_url)
             """).eq("child_id", child_id).execute()
@@ -123,13 +132,14 @@ class AnalyticsService:
                     'awarded_at': cert_row['awarded_at']
                 })
             
-            # Get token account info
-            token_result = self.supabase.table("token_accounts").select("*").eq("child_id", child_id).execute()
-            token_info = token_result.data[0] if token_result.data else {
+            # Get token account info; balances come from the ledger
+            token_result = await self.supabase.table("token_accounts").select("rank_percentile").eq("child_id", child_id).execute()
+            balance_result = await self.supabase.rpc("token_balances", {"p_child_ids": [child_id]}).execute()
+            token_info = balance_result.data[0] if balance_result.data else {
                 'balance': 0,
-                'weekly_earned': 0,
-                'rank_percentile': 0.0
+                'weekly_earned': 0
             }
+            token_info['rank_percentile'] = token_result.data[0].get('rank_percentile') if token_result.data else 0.0
             
             return {
                 'child_name': child.get('nickname', 'Child'),
@@ -138,7 +148,7 @@ class AnalyticsService:
                 'tokens': {
                     'balance': token_info['balance'],
                     'weekly_earned': token_info['weekly_earned'],
-                    'rank_percentile': float(token_info.get('rank_percentile', 0.0))
+                    'rank_percentile': float(token_info.get('rank_percentile') or 0.0)
                 }
             }
             
@@ -147,34 +157,44 @@ class AnalyticsService:
             raise
     
     async def get_leaderboard(self, user_id: str, child_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get leaderboard data for user's children"""
+        """Get this week's leaderboard standings for user's children"""
         try:
             # Get user's children
-            children_result = self.supabase.table("children").select("*").eq("parent_user_id", user_id).execute()
-            children = {child['id']: child for child in children_result.data}
+            children = await get_owned_children(self.supabase, user_id)
             
             if not children:
                 return []
             
             # Filter by specific child if provided
             target_children = [child_id] if child_id and child_id in children else list(children.keys())
+            period_start = self._current_period_start().isoformat()
             
-            # Get latest leaderboard entries
-            leaderboard_result = self.supabase.table("leaderboards").select("""
-                *,
-                classes(name, grade, school)
-            """).in_("child_id", target_children).order("period_start", desc=True).execute()
+            # Boards are maintained as tokens are earned, so this is a key lookup per child
+            leaderboard_result, global_result = await asyncio.gather(
+                self.supabase.table("leaderboards").select("""
+                    *,
+                    classes(name, grade, school)
+                """).eq("period_start", period_start).in_("child_id", target_children).execute(),
+                self.supabase.table("leaderboard_scores").select(
+                    "child_id, rank, percentile"
+                ).eq("period_start", period_start).in_("child_id", target_children).execute()
+            )
+            global_ranks = {row['child_id']: row for row in global_result.data}
             
             leaderboard_data = []
             for entry in leaderboard_result.data:
                 child = children[entry['child_id']]
-                class_info = entry.get('classes', {})
+                class_info = entry.get('classes') or {}
+                global_rank = global_ranks.get(entry['child_id'], {})
                 
                 leaderboard_data.append({
                     'child_id': entry['child_id'],
                     'child_name': child.get('nickname', 'Child'),
+                    'score': entry.get('score', 0),
                     'rank': entry['rank'],
-                    'percentile': float(entry.get('percentile', 0.0)),
+                    'percentile': float(entry.get('percentile') or 0.0),
+                    'global_rank': global_rank.get('rank'),
+                    'global_percentile': float(global_rank.get('percentile') or 0.0),
                     'class_name': class_info.get('name', 'Unknown Class'),
                     'period': f"{entry['period_start']} to {entry['period_end']}"
                 })
@@ -184,3 +204,95 @@ class AnalyticsService:
         except Exception as e:
             logger.error(f"Failed to get leaderboard: {e}")
             raise
+    
+    async def recompute_leaderboards(self, period_start: Optional[date] = None, batch_size: int = settings.LEADERBOARD_BATCH_SIZE) -> Dict[str, Any]:
+        """Rebuild class and global leaderboards for a period from the token ledger"""
+        try:
+            period_start = period_start or self._current_period_start()
+            period_start -= timedelta(days=period_start.weekday())  # Boards are keyed by week start
+            period = period_start.isoformat()
+            class_rows = 0
+            last_class_id = None
+            
+            # Class boards, a batch of classes per call
+            while True:
+                query = self.supabase.table("classes").select("id").order("id").limit(batch_size)
+                if last_class_id:
+                    query = query.gt("id", last_class_id)
+                
+                class_ids = [row["id"] for row in (await query.execute()).data]
+                if not class_ids:
+                    break
+                
+                result = await self.supabase.rpc("recompute_class_leaderboards", {
+                    "p_period_start": period,
+                    "p_class_ids": class_ids
+                }).execute()
+                class_rows += result.data or 0
+                last_class_id = class_ids[-1]
+                
+                if len(class_ids) < batch_size:
+                    break
+            
+            global_result = await self.supabase.rpc("recompute_global_leaderboard", {"p_period_start": period}).execute()
+            global_rows = global_result.data or 0
+            
+            logger.info(f"Recomputed leaderboards for {period}: {class_rows} class entries, {global_rows} global entries")
+            return {"period_start": period, "class_entries": class_rows, "global_entries": global_rows}
+            
+        except Exception as e:
+            logger.error(f"Failed to recompute leaderboards: {e}")
+            raise
+    
+    async def rollup_kpis(self, weeks: int = 1, batch_size: int = settings.KPI_ROLLUP_BATCH_SIZE) -> int:
+        """Recompute weekly KPIs for every child over the last N weeks, a batch of children at a time"""
+        try:
+            current_week = self._current_period_start()
+            period_from = (current_week - timedelta(weeks=weeks - 1)).isoformat()
+            period_to = (current_week + timedelta(weeks=1)).isoformat()
+            written = 0
+            last_child_id = None
+            
+            while True:
+                query = self.supabase.table("children").select("id").order("id").limit(batch_size)
+                if last_child_id:
+                    query = query.gt("id", last_child_id)
+                
+                child_ids = [row["id"] for row in (await query.execute()).data]
+                if not child_ids:
+                    break
+                
+                result = await self.supabase.rpc("rollup_weekly_kpis", {
+                    "p_child_ids": child_ids,
+                    "p_from": period_from,
+                    "p_to": period_to
+                }).execute()
+                written += result.data or 0
+                last_child_id = child_ids[-1]
+                
+                if len(child_ids) < batch_size:
+                    break
+            
+            logger.info(f"Rolled up {weeks} weeks of KPIs, {written} metric rows written")
+            return written
+            
+        except Exception as e:
+            logger.error(f"Failed to roll up KPIs: {e}")
+            raise
+    
+    async def rollup_recent_kpis(self) -> int:
+        """Incremental KPI rollup for the children and weeks touched since the last run"""
+        try:
+            result = await self.supabase.rpc("rollup_recent_kpis", {}).execute()
+            written = result.data or 0
+            logger.info(f"Incremental KPI rollup wrote {written} metric rows")
+            return written
+            
+        except Exception as e:
+            logger.error(f"Failed to run incremental KPI rollup: {e}")
+            raise
+    
+    def _current_period_start(self) -> date:
+        """Monday of the current week in UTC, matching date_trunc('week', now()) in the database"""
+        today = datetime.now(timezone.utc).date()
+        return today - timedelta(days=today.weekday())
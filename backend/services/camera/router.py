@@ -2,8 +2,9 @@
 Camera microservice router
 """
 
-from fastapi import APIRouter, Depends, UploadFile, File, Form
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from core.auth import get_current_user, AuthUser
+from core.uploads import UploadError
 from .service import process_camera_image
 
 router = APIRouter()
@@ -15,4 +16,7 @@ async def capture_image(
     current_user: AuthUser = Depends(get_current_user)
 ):
     """Handle camera capture and AI analysis"""
-    return await process_camera_image(image, word_of_the_day, current_user)
+    try:
+        return await process_camera_image(image, word_of_the_day, current_user)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
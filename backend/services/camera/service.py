@@ -2,20 +2,20 @@
 Camera service for handling image processing
 """
 
-import base64
 from fastapi import UploadFile
-from services.games.router import analyze_image_with_gpt4o
+from core.uploads import IMAGE_TYPES, read_upload
+from services.games.service import judge_image
 
 
 async def process_camera_image(image: UploadFile, word_of_the_day: str, user):
     """Process uploaded image and analyze with AI"""
+    # Size and type problems raise UploadError for the router to turn into an HTTP error
+    upload = await read_upload(image, allowed_types=IMAGE_TYPES)
+    
     try:
-        # Read image data
-        image_data = await image.read()
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Use existing AI analysis
-        result = await analyze_image_with_gpt4o(image_base64, word_of_the_day)
+        with upload, upload.open() as stream:
+            # Hand the model client the spooled upload; the upload hash doubles as the cache key
+            result = await judge_image(stream, word_of_the_day, upload.sha256)
         
         return {
             "is_correct": result.get("is_correct", False),
@@ -7,7 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional, Dict, Any
 import logging
 
-from core.auth import get_current_user, AuthUser
+from core.auth import get_current_user, get_current_admin, AuthUser
 from models.community import (
     Post, PostCreate, PostWithAuthor,
     Comment, CommentCreate, CommentWithAuthor,
@@ -41,6 +41,11 @@ async def get_community_feed(
             limit=limit,
             cursor=cursor
         )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Failed to get community feed: {e}")
         raise HTTPException(
@@ -111,6 +116,23 @@ async def toggle_like(
         )
 
 
+@router.post("/admin/reconcile-counters")
+async def reconcile_post_counters(
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Repair drift in the denormalized post likes/comments counters"""
+    try:
+        service = CommunityService()
+        repaired = await service.reconcile_post_counters()
+        return {"message": "Post counters reconciled", "data": {"repaired": repaired}}
+    except Exception as e:
+        logger.error(f"Failed to reconcile post counters: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to reconcile post counters"
+        )
+
+
 @router.get("/experts", response_model=List[ExpertProfile])
 async def get_expert_parents(
     current_user: AuthUser = Depends(get_current_user),
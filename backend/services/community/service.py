@@ -8,7 +8,8 @@ import uuid
 import logging
 from datetime import datetime
 
-from core.database import get_supabase_client
+from core.database import get_async_supabase_client
+from core.pagination import apply_keyset, keyset_page
 from models.community import (
     Post, PostCreate, PostUpdate, PostWithAuthor,
     Comment, CommentCreate, CommentWithAuthor,
@@ -25,7 +26,7 @@ class CommunityService:
     """Service for community features"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.supabase = get_async_supabase_client()
     
     async def get_community_feed(
         self, 
@@ -44,6 +45,8 @@ class CommunityService:
                 content,
                 media,
                 anonymous,
+                likes_count,
+                comments_count,
                 created_at,
                 author_user_id,
                 class_id
@@ -52,7 +55,7 @@ class CommunityService:
             # Apply filters
             if class_id:
                 # Get user's class info to filter posts
-                user_classes_result = self.supabase.table("enrollments").select("""
+                user_classes_result = await self.supabase.table("enrollments").select("""
                     class_id,
                     children!inner(parent_user_id)
                 """).eq("children.parent_user_id", user_id).execute()
@@ -64,24 +67,11 @@ class CommunityService:
             if post_type:
                 query = query.eq("type", post_type.value)
             
-            # Apply cursor-based pagination
-            if cursor:
-                query = query.lt("created_at", cursor)
+            # Keyset pagination on (created_at, id), newest first
+            query = apply_keyset(query, cursor, limit)
             
-            # Order by creation time (newest first) and limit
-            query = query.order("created_at", desc=True).limit(limit + 1)  # +1 to check for more
-            
-            result = query.execute()
-            posts_data = result.data
-            
-            # Process results for pagination
-            has_more = len(posts_data) > limit
-            if has_more:
-                posts_data = posts_data[:-1]  # Remove extra item
-            
-            next_cursor = None
-            if has_more and posts_data:
-                next_cursor = posts_data[-1]["created_at"]
+            result = await query.execute()
+            posts_data, next_cursor, has_more = keyset_page(result.data, limit)
             
             # Process posts
             posts_with_authors = []
@@ -91,7 +81,7 @@ class CommunityService:
             profiles_dict = {}
             
             if author_ids:
-                profiles_result = self.supabase.table("profiles").select(
+                profiles_result = await self.supabase.table("profiles").select(
                     "user_id, full_name, school, grade"
                 ).in_("user_id", author_ids).execute()
                 
@@ -100,11 +90,11 @@ class CommunityService:
                     for profile in profiles_result.data
                 }
             
+            # Get engagement stats for the whole page in a fixed number of queries
+            engagement = await self._get_engagement_stats(posts_data, user_id)
+            
             for post_data in posts_data:
-                # Get engagement stats
-                likes_result = self.supabase.table("reactions").select("id").eq("post_id", post_data["id"]).execute()
-                comments_result = self.supabase.table("comments").select("id").eq("post_id", post_data["id"]).execute()
-                user_like_result = self.supabase.table("reactions").select("id").eq("post_id", post_data["id"]).eq("user_id", user_id).execute()
+                stats = engagement.get(post_data["id"], {})
                 
                 # Get author info from profiles dict
                 author_info = profiles_dict.get(post_data["author_user_id"], {})
@@ -118,9 +108,9 @@ class CommunityService:
                     class_id=post_data.get("class_id"),
                     author_user_id=post_data["author_user_id"],
                     created_at=post_data["created_at"],
-                    likes_count=len(likes_result.data),
-                    comments_count=len(comments_result.data),
-                    user_has_liked=len(user_like_result.data) > 0,
+                    likes_count=stats.get("likes_count", 0),
+                    comments_count=stats.get("comments_count", 0),
+                    user_has_liked=stats.get("user_has_liked", False),
                     author_name=author_info.get("full_name") if not post_data.get("anonymous") else None,
                     author_school=author_info.get("school") if not post_data.get("anonymous") else None,
                     author_grade=author_info.get("grade") if not post_data.get("anonymous") else None
@@ -137,7 +127,40 @@ class CommunityService:
         except Exception as e:
             logger.error(f"Failed to get community feed: {e}")
             raise
-    
+
+    async def _get_engagement_stats(self, posts: List[Dict[str, Any]], user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Get likes count, comments count and the user's like flag for a page of posts"""
+        stats = {
+            post["id"]: {
+                "likes_count": post.get("likes_count") or 0,
+                "comments_count": post.get("comments_count") or 0,
+                "user_has_liked": False
+            }
+            for post in posts
+        }
+
+        if not stats:
+            return stats
+
+        # Counts come from the denormalized counters on posts; only the like flags need a query
+        user_likes_result = await self.supabase.table("reactions").select("post_id").in_("post_id", list(stats.keys())).eq("user_id", user_id).execute()
+        for row in user_likes_result.data:
+            stats[row["post_id"]]["user_has_liked"] = True
+
+        return stats
+
+    async def reconcile_post_counters(self) -> int:
+        """Recompute likes/comments counters from source rows, returning how many posts drifted"""
+        try:
+            result = await self.supabase.rpc("reconcile_post_counters", {}).execute()
+            repaired = result.data or 0
+            logger.info(f"Reconciled post counters, {repaired} posts repaired")
+            return repaired
+            
+        except Exception as e:
+            logger.error(f"Failed to reconcile post counters: {e}")
+            raise
+
     async def create_post(self, user_id: str, post_data: PostCreate) -> PostWithAuthor:
         """Create a new community post"""
         try:
@@ -145,10 +168,10 @@ class CommunityService:
             class_id = post_data.class_id
             if not class_id:
                 # Get user's first child's class as default
-                child_result = self.supabase.table("children").select("id").eq("parent_user_id", user_id).limit(1).execute()
+                child_result = await self.supabase.table("children").select("id").eq("parent_user_id", user_id).limit(1).execute()
                 if child_result.data:
                     child_id = child_result.data[0]["id"]
-                    enrollment_result = self.supabase.table("enrollments").select("class_id").eq("child_id", child_id).limit(1).execute()
+                    enrollment_result = await self.supabase.table("enrollments").select("class_id").eq("child_id", child_id).limit(1).execute()
                     if enrollment_result.data:
                         class_id = enrollment_result.data[0]["class_id"]
             
@@ -159,7 +182,7 @@ class CommunityService:
             post_dict["class_id"] = class_id
             post_dict["created_at"] = datetime.utcnow()
             
-            result = self.supabase.table("posts").insert(post_dict).execute()
+            result = await self.supabase.table("posts").insert(post_dict).execute()
             
             if not result.data:
                 raise ValueError("Failed to create post")
@@ -167,7 +190,7 @@ class CommunityService:
             post = result.data[0]
             
             # Get author info
-            author_result = self.supabase.table("profiles").select("full_name, school, grade").eq("user_id", user_id).execute()
+            author_result = await self.supabase.table("profiles").select("full_name, school, grade").eq("user_id", user_id).execute()
             author_info = author_result.data[0] if author_result.data else {}
             
             return PostWithAuthor(
@@ -199,7 +222,7 @@ class CommunityService:
             comment_dict["author_user_id"] = user_id
             comment_dict["created_at"] = datetime.utcnow()
             
-            result = self.supabase.table("comments").insert(comment_dict).execute()
+            result = await self.supabase.table("comments").insert(comment_dict).execute()
             
             if not result.data:
                 raise ValueError("Failed to create comment")
@@ -207,7 +230,7 @@ class CommunityService:
             comment = result.data[0]
             
             # Get author info
-            author_result = self.supabase.table("profiles").select("full_name").eq("user_id", user_id).execute()
+            author_result = await self.supabase.table("profiles").select("full_name").eq("user_id", user_id).execute()
             author_name = author_result.data[0]["full_name"] if author_result.data else None
             
             return CommentWithAuthor(
@@ -227,11 +250,11 @@ class CommunityService:
         """Toggle like on a post"""
         try:
             # Check if user already liked this post
-            existing_like = self.supabase.table("reactions").select("id").eq("post_id", reaction_data.post_id).eq("user_id", user_id).execute()
+            existing_like = await self.supabase.table("reactions").select("id").eq("post_id", reaction_data.post_id).eq("user_id", user_id).execute()
             
             if existing_like.data:
                 # Unlike - remove reaction
-                self.supabase.table("reactions").delete().eq("id", existing_like.data[0]["id"]).execute()
+                await self.supabase.table("reactions").delete().eq("id", existing_like.data[0]["id"]).execute()
                 liked = False
             else:
                 # Like - create reaction
@@ -239,12 +262,12 @@ class CommunityService:
                 reaction_dict["id"] = str(uuid.uuid4())
                 reaction_dict["user_id"] = user_id
                 
-                self.supabase.table("reactions").insert(reaction_dict).execute()
+                await self.supabase.table("reactions").insert(reaction_dict).execute()
                 liked = True
             
-            # Get updated like count
-            likes_result = self.supabase.table("reactions").select("id").eq("post_id", reaction_data.post_id).execute()
-            likes_count = len(likes_result.data)
+            # The like counter is maintained by a trigger on reactions, in the same transaction
+            post_result = await self.supabase.table("posts").select("likes_count").eq("id", reaction_data.post_id).execute()
+            likes_count = post_result.data[0]["likes_count"] if post_result.data else 0
             
             return {
                 "liked": liked,
@@ -260,7 +283,7 @@ class CommunityService:
         try:
             # Get parents with high helpful answer counts
             # This is a simplified version - in production you'd have more complex criteria
-            result = self.supabase.table("profiles").select("""
+            result = await self.supabase.table("profiles").select("""
                 user_id,
                 full_name,
                 school,
@@ -294,7 +317,7 @@ class CommunityService:
         """Get chat threads for user"""
         try:
             # Get threads where user is a participant
-            threads_result = self.supabase.table("thread_participants").select("""
+            threads_result = await self.supabase.table("thread_participants").select("""
                 thread_id,
                 last_read_at,
                 threads!inner (
@@ -312,7 +335,7 @@ class CommunityService:
                 thread_id = thread["id"]
                 
                 # Get last message
-                last_message_result = self.supabase.table("messages").select("""
+                last_message_result = await self.supabase.table("messages").select("""
                     body,
                     created_at,
                     author_id,
@@ -329,13 +352,13 @@ class CommunityService:
                 # Calculate unread count
                 unread_count = 0
                 if thread_data["last_read_at"]:
-                    unread_result = self.supabase.table("messages").select("id").eq("thread_id", thread_id).gt("created_at", thread_data["last_read_at"]).execute()
+                    unread_result = await self.supabase.table("messages").select("id").eq("thread_id", thread_id).gt("created_at", thread_data["last_read_at"]).execute()
                     unread_count = len(unread_result.data)
                 
                 # Get thread name (for direct chats, use other participant's name)
                 thread_name = "Chat"
                 if thread["type"] == "direct":
-                    other_participants = self.supabase.table("thread_participants").select("""
+                    other_participants = await self.supabase.table("thread_participants").select("""
                         user_id,
                         profiles!thread_participants_user_id_fkey (full_name)
                     """).eq("thread_id", thread_id).neq("user_id", user_id).execute()
@@ -367,7 +390,7 @@ class CommunityService:
             report_dict["status"] = "open"
             report_dict["created_at"] = datetime.utcnow()
             
-            result = self.supabase.table("reports").insert(report_dict).execute()
+            result = await self.supabase.table("reports").insert(report_dict).execute()
             
             if not result.data:
                 raise ValueError("Failed to create report")
@@ -382,12 +405,14 @@ class CommunityService:
         """Get a single post by ID with author info and user's like status"""
         try:
             # Get the post
-            post_result = self.supabase.table("posts").select("""
+            post_result = await self.supabase.table("posts").select("""
                 id,
                 type,
                 content,
                 media,
                 anonymous,
+                likes_count,
+                comments_count,
                 created_at,
                 author_user_id,
                 class_id
@@ -401,7 +426,7 @@ class CommunityService:
             # Get author profile
             author_profile = {}
             if not post_data.get("anonymous", False):
-                profile_result = self.supabase.table("profiles").select(
+                profile_result = await self.supabase.table("profiles").select(
                     "user_id, full_name, school, grade"
                 ).eq("user_id", post_data["author_user_id"]).execute()
                 
@@ -409,9 +434,8 @@ class CommunityService:
                     author_profile = profile_result.data[0]
             
             # Get engagement stats
-            likes_result = self.supabase.table("reactions").select("id").eq("post_id", post_id).execute()
-            comments_result = self.supabase.table("comments").select("id").eq("post_id", post_id).execute()
-            user_like_result = self.supabase.table("reactions").select("id").eq("post_id", post_id).eq("user_id", user_id).execute()
+            engagement = await self._get_engagement_stats([post_data], user_id)
+            stats = engagement.get(post_id, {})
             
             return PostWithAuthor(
                 id=post_data["id"],
@@ -422,9 +446,9 @@ class CommunityService:
                 class_id=post_data.get("class_id"),
                 author_user_id=post_data["author_user_id"],
                 created_at=post_data["created_at"],
-                likes_count=len(likes_result.data),
-                comments_count=len(comments_result.data),
-                user_has_liked=len(user_like_result.data) > 0,
+                likes_count=stats.get("likes_count", 0),
+                comments_count=stats.get("comments_count", 0),
+                user_has_liked=stats.get("user_has_liked", False),
                 author_name=author_profile.get("full_name"),
                 author_school=author_profile.get("school"),
                 author_grade=author_profile.get("grade")
@@ -438,7 +462,7 @@ class CommunityService:
         """Get comments for a specific post"""
         try:
             # Get comments
-            comments_result = self.supabase.table("comments").select("""
+            comments_result = await self.supabase.table("comments").select("""
                 id,
                 content,
                 created_at,
@@ -453,7 +477,7 @@ class CommunityService:
             profiles_dict = {}
             
             if author_ids:
-                profiles_result = self.supabase.table("profiles").select(
+                profiles_result = await self.supabase.table("profiles").select(
                     "user_id, full_name, school, grade"
                 ).in_("user_id", author_ids).execute()
                 
@@ -498,7 +522,7 @@ class CommunityService:
             }
             
             # Create the thread
-            thread_result = self.supabase.table("threads").insert(thread_dict).execute()
+            thread_result = await self.supabase.table("threads").insert(thread_dict).execute()
             
             if not thread_result.data:
                 raise ValueError("Failed to create thread")
@@ -523,7 +547,7 @@ class CommunityService:
                 })
             
             if participants:
-                self.supabase.table("thread_participants").insert(participants).execute()
+                await self.supabase.table("thread_participants").insert(participants).execute()
             
             return thread
             
@@ -535,7 +559,7 @@ class CommunityService:
         """Send a message in a chat thread"""
         try:
             # Verify user is participant in thread
-            participant_result = self.supabase.table("thread_participants").select("user_id").eq(
+            participant_result = await self.supabase.table("thread_participants").select("user_id").eq(
                 "thread_id", message_data.thread_id
             ).eq("user_id", user_id).execute()
             
@@ -551,13 +575,13 @@ class CommunityService:
                 "created_at": datetime.utcnow()
             }
             
-            result = self.supabase.table("messages").insert(message_dict).execute()
+            result = await self.supabase.table("messages").insert(message_dict).execute()
             
             if not result.data:
                 raise ValueError("Failed to send message")
             
             # Get author profile
-            profile_result = self.supabase.table("profiles").select(
+            profile_result = await self.supabase.table("profiles").select(
                 "user_id, full_name, school, grade"
             ).eq("user_id", user_id).execute()
             
@@ -583,7 +607,7 @@ class CommunityService:
         """Get messages from a chat thread"""
         try:
             # Verify user is participant in thread
-            participant_result = self.supabase.table("thread_participants").select("user_id").eq(
+            participant_result = await self.supabase.table("thread_participants").select("user_id").eq(
                 "thread_id", thread_id
             ).eq("user_id", user_id).execute()
             
@@ -591,7 +615,7 @@ class CommunityService:
                 raise ValueError("User is not a participant in this thread")
             
             # Get messages
-            messages_result = self.supabase.table("messages").select("""
+            messages_result = await self.supabase.table("messages").select("""
                 id,
                 thread_id,
                 author_id,
@@ -608,7 +632,7 @@ class CommunityService:
             profiles_dict = {}
             
             if author_ids:
-                profiles_result = self.supabase.table("profiles").select(
+                profiles_result = await self.supabase.table("profiles").select(
                     "user_id, full_name, school, grade"
                 ).in_("user_id", author_ids).execute()
                 
@@ -653,6 +677,8 @@ class CommunityService:
                 content,
                 media,
                 anonymous,
+                likes_count,
+                comments_count,
                 created_at,
                 author_user_id,
                 class_id
@@ -664,7 +690,7 @@ class CommunityService:
             # Order by creation time and limit
             query = query.order("created_at", desc=True).limit(limit)
             
-            result = query.execute()
+            result = await query.execute()
             posts_data = result.data
             
             # Get author profiles
@@ -672,7 +698,7 @@ class CommunityService:
             profiles_dict = {}
             
             if author_ids:
-                profiles_result = self.supabase.table("profiles").select(
+                profiles_result = await self.supabase.table("profiles").select(
                     "user_id, full_name, school, grade"
                 ).in_("user_id", author_ids).execute()
                 
@@ -683,11 +709,10 @@ class CommunityService:
             
             # Build posts with author info and engagement stats
             posts_with_authors = []
+            engagement = await self._get_engagement_stats(posts_data, user_id)
+            
             for post_data in posts_data:
-                # Get engagement stats
-                likes_result = self.supabase.table("reactions").select("id").eq("post_id", post_data["id"]).execute()
-                comments_result = self.supabase.table("comments").select("id").eq("post_id", post_data["id"]).execute()
-                user_like_result = self.supabase.table("reactions").select("id").eq("post_id", post_data["id"]).eq("user_id", user_id).execute()
+                stats = engagement.get(post_data["id"], {})
                 
                 # Get author info
                 author_info = profiles_dict.get(post_data["author_user_id"], {})
@@ -701,9 +726,9 @@ class CommunityService:
                     class_id=post_data.get("class_id"),
                     author_user_id=post_data["author_user_id"],
                     created_at=post_data["created_at"],
-                    likes_count=len(likes_result.data),
-                    comments_count=len(comments_result.data),
-                    user_has_liked=len(user_like_result.data) > 0,
+                    likes_count=stats.get("likes_count", 0),
+                    comments_count=stats.get("comments_count", 0),
+                    user_has_liked=stats.get("user_has_liked", False),
                     author_name=author_info.get("full_name") if not post_data.get("anonymous") else "Anonymous",
                     author_school=author_info.get("school") if not post_data.get("anonymous") else None,
                     author_grade=author_info.get("grade") if not post_data.get("anonymous") else None
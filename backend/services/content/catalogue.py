@@ -0,0 +1,80 @@
+"""
+In-process cache of the booklet -> module -> activity catalogue
+"""
+
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BookletCatalogue:
+    """Versioned snapshot of the curriculum tree, shared across children and requests"""
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def get(self, supabase) -> Dict[str, Any]:
+        """Get the current snapshot, rebuilding it when stale or invalidated"""
+        if self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._snapshot
+        
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if self._snapshot is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._snapshot = await self._load(supabase)
+                self._loaded_at = time.monotonic()
+        
+        return self._snapshot
+    
+    def invalidate(self) -> None:
+        """Force a rebuild on next access (call after curriculum changes)"""
+        self._snapshot = None
+    
+    async def _load(self, supabase) -> Dict[str, Any]:
+        """Fetch the full tree and normalize it once"""
+        booklets_result = await supabase.table("booklets").select("""
+            id, title, subtitle, subject, total_modules, week_start, week_end, locale,
+            modules(
+                id, idx, title, description,
+                activities(
+                    id, type, points, est_minutes, instructions
+                )
+            )
+        """).order("title").execute()
+        
+        booklets: List[Dict[str, Any]] = []
+        activity_ids_by_booklet: Dict[str, List[str]] = {}
+        
+        for booklet_data in booklets_result.data:
+            # Sort modules by index
+            booklet = dict(booklet_data)
+            booklet["modules"] = sorted(booklet_data.get("modules") or [], key=lambda m: m.get("idx", 0))
+            booklets.append(booklet)
+            
+            activity_ids_by_booklet[booklet["id"]] = [
+                activity["id"]
+                for module in booklet["modules"]
+                for activity in (module.get("activities") or [])
+            ]
+        
+        self.version += 1
+        logger.info(f"Loaded booklet catalogue v{self.version}: {len(booklets)} booklets")
+        
+        return {
+            "version": self.version,
+            "booklets": booklets,
+            "activity_ids_by_booklet": activity_ids_by_booklet
+        }
+
+
+# Global instance
+booklet_catalogue = BookletCatalogue(ttl=settings.CATALOGUE_CACHE_TTL)
@@ -4,15 +4,16 @@ Handles booklets, modules, activities, and progress tracking
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from typing import List, Optional
+from typing import List, Optional, Dict
 import logging
 
-from core.auth import get_current_user, get_current_parent, AuthUser
+from core.auth import get_current_user, get_current_parent, get_current_admin, get_current_teacher, AuthUser
 from models.content import (
     Booklet, BookletWithModules, Activity, ActivityProgress,
     ProgressUpdateRequest, BulkProgressRequest, WeeklyProgress,
     BookletProgress
 )
+from core.uploads import UploadError
 from .service import ContentService
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,23 @@ async def get_booklets(
         )
 
 
+@router.post("/admin/refresh-catalogue")
+async def refresh_catalogue(
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Reload the cached booklet catalogue after curriculum changes"""
+    try:
+        service = ContentService()
+        version = await service.refresh_catalogue()
+        return {"message": "Booklet catalogue refreshed", "version": version}
+    except Exception as e:
+        logger.error(f"Failed to refresh booklet catalogue: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to refresh booklet catalogue"
+        )
+
+
 @router.get("/booklets/{booklet_id}", response_model=BookletWithModules)
 async def get_booklet_detail(
     booklet_id: str,
@@ -81,7 +99,7 @@ async def update_progress(
     """Update activity progress for a child"""
     try:
         service = ContentService()
-        return await service.update_activity_progress(progress_data, current_user.user_id)
+        return await service.update_activity_progress_from_request(progress_data, current_user.user_id)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,7 +122,11 @@ async def update_bulk_progress(
     try:
         service = ContentService()
         results = await service.update_bulk_progress(bulk_data.updates, current_user.user_id)
-        return {"message": f"Updated {len(results)} activities", "results": results}
+        updated = sum(1 for result in results if result.success)
+        return {
+            "message": f"Updated {updated} of {len(results)} activities",
+            "results": results
+        }
     except Exception as e:
         logger.error(f"Failed to update bulk progress: {e}")
         raise HTTPException(
@@ -148,6 +170,23 @@ async def get_booklet_progress(
         )
 
 
+@router.get("/progress/booklets/class", response_model=Dict[str, List[BookletProgress]])
+async def get_class_booklet_progress(
+    class_id: str = Query(..., description="Class ID"),
+    current_user: AuthUser = Depends(get_current_teacher)
+):
+    """Get booklet progress summaries for every child in a class, keyed by child ID"""
+    try:
+        service = ContentService()
+        return await service.get_class_booklet_progress(class_id)
+    except Exception as e:
+        logger.error(f"Failed to get class booklet progress: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve class booklet progress"
+        )
+
+
 @router.post("/upload-proof")
 async def upload_proof_image(
     file: UploadFile = File(...),
@@ -164,16 +203,9 @@ async def upload_proof_image(
                 detail="Only image files are allowed"
             )
         
-        # Validate file size (max 10MB)
-        if file.size and file.size > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File size too large (max 10MB)"
-            )
-        
         service = ContentService()
         
-        # Upload image and get URL
+        # Upload image and get URL (size and real type are checked while streaming)
         proof_url = await service.upload_proof_image(file, current_user.user_id)
         
         # Just save the proof URL without changing status to completed
@@ -186,6 +218,10 @@ async def upload_proof_image(
         
         return {"proof_url": proof_url, "message": "Proof uploaded successfully"}
         
+    except HTTPException:
+        raise
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to upload proof image: {e}")
         raise HTTPException(
@@ -3,74 +3,75 @@ Content service implementation
 Business logic for booklets, activities, and progress tracking
 """
 
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 import uuid
 import os
 
-from core.database import get_supabase_client
+from postgrest.exceptions import APIError
+
+from core.database import get_async_supabase_client
+from core.ownership import get_owned_child, get_owned_children
+from core.uploads import IMAGE_TYPES, read_upload
 from models.content import (
     BookletWithModules, Activity, ActivityProgress, ActivityWithProgress,
-    ModuleWithActivities, ProgressUpdateRequest, WeeklyProgress, BookletProgress
+    ModuleWithActivities, ProgressUpdateRequest, WeeklyProgress, BookletProgress,
+    BulkProgressResult
 )
+from services.user.bundle_cache import invalidate_user_bundle
+from .catalogue import booklet_catalogue
 
 logger = logging.getLogger(__name__)
 
+# Postgres: no unique constraint matches the ON CONFLICT columns
+NO_CONFLICT_TARGET = "42P10"
+
 
 class ContentService:
     """Service for content and progress management"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.supabase = get_async_supabase_client()
     
     async def get_booklets_with_progress(self, week: Optional[str], child_id: Optional[str], user_id: str) -> List[BookletWithModules]:
         """Get booklets with modules and progress"""
         try:
             # If child_id is provided, verify it belongs to the user
             if child_id:
-                result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-                if not result.data:
-                    raise ValueError("Child not found or access denied")
-            
-            # Get booklets with their modules and activities
-            booklets_result = self.supabase.table("booklets").select("""
-                id, title, subtitle, subject, total_modules, week_start, week_end, locale,
-                modules(
-                    id, idx, title, description,
-                    activities(
-                        id, type, points, est_minutes, instructions
-                    )
-                )
-            """).order("title").execute()
+                await get_owned_child(self.supabase, child_id, user_id)
+            
+            # Booklets with their modules and activities come from the shared catalogue
+            catalogue = await booklet_catalogue.get(self.supabase)
+            
+            # Load all of the child's progress in one query, indexed by activity
+            progress_by_activity = {}
+            if child_id:
+                progress_result = await self.supabase.table("activity_progress").select("*").eq("child_id", child_id).execute()
+                progress_by_activity = {row['activity_id']: row for row in progress_result.data}
             
             booklets_with_modules = []
             
-            for booklet_data in booklets_result.data:
-                # Sort modules by index
-                modules = sorted(booklet_data.get('modules', []), key=lambda m: m.get('idx', 0))
-                
+            for booklet_data in catalogue["booklets"]:
                 modules_with_activities = []
-                for module_data in modules:
+                for module_data in booklet_data['modules']:
                     activities = []
                     
                     for activity_data in module_data.get('activities', []):
-                        # Get progress for this activity if child_id is provided
+                        # Attach progress for this activity if child_id is provided
                         progress_data = None
-                        if child_id:
-                            progress_result = self.supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity_data['id']).execute()
-                            if progress_result.data:
-                                progress_info = progress_result.data[0]
-                                progress_data = ActivityProgress(
-                                    id=progress_info['id'],
-                                    child_id=progress_info['child_id'],
-                                    activity_id=progress_info['activity_id'],
-                                    status=progress_info['status'],
-                                    proof_url=progress_info.get('proof_url'),
-                                    score=progress_info.get('score'),
-                                    notes=progress_info.get('notes'),
-                                    completed_at=progress_info.get('completed_at')
-                                )
+                        progress_info = progress_by_activity.get(activity_data['id'])
+                        if progress_info:
+                            progress_data = ActivityProgress(
+                                id=progress_info['id'],
+                                child_id=progress_info['child_id'],
+                                activity_id=progress_info['activity_id'],
+                                status=progress_info['status'],
+                                proof_url=progress_info.get('proof_url'),
+                                score=progress_info.get('score'),
+                                notes=progress_info.get('notes'),
+                                completed_at=progress_info.get('completed_at')
+                            )
                         
                         # Create ActivityWithProgress object
                         activity = ActivityWithProgress(
@@ -118,6 +119,17 @@ class ContentService:
             logger.error(f"Failed to get booklets: {e}")
             raise
     
+    async def refresh_catalogue(self) -> int:
+        """Drop the cached booklet catalogue and reload it, returning the new version"""
+        try:
+            booklet_catalogue.invalidate()
+            catalogue = await booklet_catalogue.get(self.supabase)
+            return catalogue["version"]
+            
+        except Exception as e:
+            logger.error(f"Failed to refresh booklet catalogue: {e}")
+            raise
+    
     async def get_booklet_detail(self, booklet_id: str, child_id: Optional[str], user_id: str) -> BookletWithModules:
         """Get detailed booklet with modules and activities"""
         try:
@@ -131,7 +143,7 @@ class ContentService:
     async def get_activity_detail(self, activity_id: str) -> Activity:
         """Get activity details"""
         try:
-            result = self.supabase.table("activities").select("*").eq("id", activity_id).execute()
+            result = await self.supabase.table("activities").select("*").eq("id", activity_id).execute()
             
             if not result.data:
                 raise ValueError("Activity not found")
@@ -146,36 +158,14 @@ class ContentService:
         """Update activity progress for a child"""
         try:
             # Verify parent owns child
-            result = self.supabase.table("children").select("*").eq("id", progress_data.child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
-                raise ValueError("Child not found or access denied")
-            
-            # Check if progress record already exists
-            existing_progress = self.supabase.table("activity_progress").select("*").eq("child_id", progress_data.child_id).eq("activity_id", progress_data.activity_id).execute()
-            
-            progress_record = {
-                "child_id": progress_data.child_id,
-                "activity_id": progress_data.activity_id,
-                "status": progress_data.status.value,
-                "proof_url": progress_data.proof_url,
-                "score": progress_data.score,
-                "notes": progress_data.notes
-            }
-            
-            if existing_progress.data:
-                # Update existing record
-                progress_record["completed_at"] = datetime.now().isoformat() if progress_data.status.value == "completed" else None
-                result = self.supabase.table("activity_progress").update(progress_record).eq("id", existing_progress.data[0]["id"]).execute()
-                updated_progress = result.data[0]
-            else:
-                # Create new record
-                if progress_data.status.value == "completed":
-                    progress_record["completed_at"] = datetime.now().isoformat()
-                result = self.supabase.table("activity_progress").insert(progress_record).execute()
-                updated_progress = result.data[0]
+            await get_owned_child(self.supabase, progress_data.child_id, user_id)
+            
+            updated_progress = await self._upsert_progress(self._progress_row(progress_data))
             
             # TODO: Award tokens on completion
             
+            invalidate_user_bundle(user_id)
+            
             return ActivityProgress(**updated_progress)
             
         except Exception as e:
@@ -186,29 +176,17 @@ class ContentService:
         """Update activity progress with individual parameters"""
         try:
             # Verify parent owns child
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
-                raise ValueError("Child not found or access denied")
+            await get_owned_child(self.supabase, child_id, user_id)
             
-            # Check if progress record already exists
-            existing_progress = self.supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity_id).execute()
-            
-            progress_record = {
+            updated_progress = await self._upsert_progress({
                 "child_id": child_id,
                 "activity_id": activity_id,
                 "status": status,
                 "proof_url": proof_url,
                 "completed_at": datetime.now().isoformat() if status == "completed" else None
-            }
+            })
             
-            if existing_progress.data:
-                # Update existing record
-                result = self.supabase.table("activity_progress").update(progress_record).eq("id", existing_progress.data[0]["id"]).execute()
-                updated_progress = result.data[0]
-            else:
-                # Create new record
-                result = self.supabase.table("activity_progress").insert(progress_record).execute()
-                updated_progress = result.data[0]
+            invalidate_user_bundle(user_id)
             
             return ActivityProgress(**updated_progress)
             
@@ -216,28 +194,35 @@ class ContentService:
             logger.error(f"Failed to update progress: {e}")
             raise
     
+    async def _upsert_progress(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert or update the progress row for (child_id, activity_id) in one statement"""
+        result = await self.supabase.table("activity_progress").upsert(row, on_conflict="child_id,activity_id").execute()
+        return result.data[0]
+    
     async def upload_proof_image(self, file, user_id: str) -> str:
         """Upload proof image to Supabase Storage and return URL"""
         try:
-            # Generate unique filename
-            file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-            unique_filename = f"{user_id}/{uuid.uuid4()}.{file_extension}"
-            
-            # Read file content
-            file_content = await file.read()
-            
-            # Upload to Supabase Storage
-            try:
-                storage_response = self.supabase.storage.from_("proof-images").upload(
-                    path=unique_filename,
-                    file=file_content,
-                    file_options={"content-type": file.content_type}
-                )
-                logger.info(f"Storage upload response: {storage_response}")
+            # Check the upload in chunks: size-capped, type-sniffed and hashed in place
+            with await read_upload(file, allowed_types=IMAGE_TYPES) as upload:
+                # Generate unique filename from the sniffed type rather than the client's name
+                unique_filename = f"{user_id}/{uuid.uuid4()}.{upload.extension}"
                 
-            except Exception as upload_error:
-                logger.error(f"Storage upload exception: {upload_error}")
-                raise Exception(f"Storage upload failed: {upload_error}")
+                # Upload to Supabase Storage straight from the spooled upload
+                payload = upload.payload()
+                try:
+                    storage_response = await self.supabase.run(
+                        self.supabase.storage.from_("proof-images").upload,
+                        path=unique_filename,
+                        file=payload,
+                        file_options={"content-type": upload.content_type}
+                    )
+                    logger.info(f"Storage upload response: {storage_response}")
+                    
+                except Exception as upload_error:
+                    logger.error(f"Storage upload exception: {upload_error}")
+                    raise Exception(f"Storage upload failed: {upload_error}")
+                finally:
+                    payload.close()
             
             # Get public URL - this returns a string directly
             public_url = self.supabase.storage.from_("proof-images").get_public_url(unique_filename)
@@ -249,41 +234,152 @@ class ContentService:
             logger.error(f"Failed to upload proof image: {e}")
             raise
     
-    async def update_bulk_progress(self, updates: List[ProgressUpdateRequest], user_id: str) -> List[ActivityProgress]:
+    async def update_bulk_progress(self, updates: List[ProgressUpdateRequest], user_id: str) -> List[BulkProgressResult]:
         """Update multiple activity progress entries"""
         try:
-            # TODO: Implement bulk update logic
-            return []
+            if not updates:
+                return []
+            
+            # Verify ownership once for all distinct children in the batch
+            requested_child_ids = set()
+            for update in updates:
+                try:
+                    requested_child_ids.add(str(uuid.UUID(update.child_id)))
+                except ValueError:
+                    pass
+            owned_child_ids = set(await get_owned_children(self.supabase, user_id, requested_child_ids))
+            
+            results: List[Optional[BulkProgressResult]] = [None] * len(updates)
+            rows_by_key = {}
+            indexes_by_key = {}
+            
+            for index, update in enumerate(updates):
+                try:
+                    # The database returns IDs in canonical (lowercase) form; compare and key on that
+                    update = update.model_copy(update={
+                        "child_id": str(uuid.UUID(update.child_id)),
+                        "activity_id": str(uuid.UUID(update.activity_id))
+                    })
+                except ValueError:
+                    results[index] = BulkProgressResult(
+                        index=index, child_id=update.child_id, activity_id=update.activity_id,
+                        success=False, error="Invalid child or activity ID"
+                    )
+                    continue
+                
+                if update.child_id not in owned_child_ids:
+                    results[index] = BulkProgressResult(
+                        index=index, child_id=update.child_id, activity_id=update.activity_id,
+                        success=False, error="Child not found or access denied"
+                    )
+                    continue
+                
+                # Later entries for the same activity win, as if applied in order
+                key = (update.child_id, update.activity_id)
+                rows_by_key[key] = self._progress_row(update)
+                indexes_by_key.setdefault(key, []).append(index)
+            
+            if rows_by_key:
+                saved_rows, errors = await self._upsert_progress_rows(list(rows_by_key.values()))
+                
+                for key, indexes in indexes_by_key.items():
+                    saved = saved_rows.get(key)
+                    for index in indexes:
+                        results[index] = BulkProgressResult(
+                            index=index, child_id=key[0], activity_id=key[1],
+                            success=saved is not None,
+                            progress=ActivityProgress(**saved) if saved else None,
+                            error=None if saved else errors.get(key, "Failed to save progress")
+                        )
+                
+                invalidate_user_bundle(user_id)
+            
+            return results
             
         except Exception as e:
             logger.error(f"Failed to update bulk progress: {e}")
             raise
     
+    def _progress_row(self, update: ProgressUpdateRequest) -> Dict[str, Any]:
+        """activity_progress row for a progress update request"""
+        return {
+            "child_id": update.child_id,
+            "activity_id": update.activity_id,
+            "status": update.status.value,
+            "proof_url": update.proof_url,
+            "score": update.score,
+            "notes": update.notes,
+            "completed_at": datetime.now().isoformat() if update.status.value == "completed" else None
+        }
+    
+    async def _upsert_progress_rows(self, rows: List[Dict[str, Any]]):
+        """Upsert progress rows in one statement, falling back to row-by-row to isolate failures
+        
+        Returns saved rows and error messages, both keyed by (child_id, activity_id).
+        Needs the unique (child_id, activity_id) constraint; databases created before it
+        existed must run supabase/activity_progress_unique_fix.sql first.
+        """
+        saved_rows = {}
+        errors = {}
+        
+        try:
+            result = await self.supabase.table("activity_progress").upsert(rows, on_conflict="child_id,activity_id").execute()
+            for row in result.data:
+                saved_rows[(row["child_id"], row["activity_id"])] = row
+            return saved_rows, errors
+        except APIError as batch_error:
+            if batch_error.code == NO_CONFLICT_TARGET:
+                # Every row would fail the same way, so don't retry them one by one
+                logger.error("activity_progress has no unique (child_id, activity_id) constraint; run supabase/activity_progress_unique_fix.sql")
+                raise
+            logger.warning(f"Bulk progress upsert failed, retrying rows individually: {batch_error}")
+        except Exception as batch_error:
+            logger.warning(f"Bulk progress upsert failed, retrying rows individually: {batch_error}")
+        
+        for row in rows:
+            key = (row["child_id"], row["activity_id"])
+            try:
+                saved_rows[key] = await self._upsert_progress(row)
+            except Exception as row_error:
+                logger.error(f"Failed to save progress for activity {row['activity_id']}: {row_error}")
+                errors[key] = str(row_error)
+        
+        return saved_rows, errors
+    
     async def get_weekly_progress(self, child_id: str, weeks: int, user_id: str) -> List[WeeklyProgress]:
         """Get weekly progress summary for a child"""
         try:
             # First verify the child belongs to the user
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
+            await get_owned_child(self.supabase, child_id, user_id)
             
-            if not result.data:
-                raise ValueError("Child not found or access denied")
+            # All requested weeks in one range query over the rolled-up KPIs
+            today = datetime.now(timezone.utc).date()
+            current_week = today - timedelta(days=today.weekday())
+            since = current_week - timedelta(weeks=weeks - 1)
+            result = await self.supabase.table("kpi_metrics").select("metric, value_num, period_start").eq("child_id", child_id).in_(
+                "metric", ["weekly_progress", "activities_completed", "activities_scheduled"]
+            ).gte("period_start", since.isoformat()).order("period_start", desc=True).execute()
             
-            # Get weekly progress metrics from KPI metrics table
-            result = self.supabase.table("kpi_metrics").select("*").eq("child_id", child_id).eq("metric", "weekly_progress").limit(weeks).order("period_start", desc=True).execute()
+            metrics_by_week: Dict[str, Dict[str, float]] = {}
+            for row in result.data:
+                metrics_by_week.setdefault(row['period_start'], {})[row['metric']] = float(row['value_num'] or 0)
             
             weekly_progress = []
-            for metric in result.data:
-                # Get completed activities count
-                activities_result = self.supabase.table("kpi_metrics").select("*").eq("child_id", child_id).eq("metric", "activities_completed").eq("period_start", metric['period_start']).single().execute()
+            for period_start, metrics in metrics_by_week.items():
+                if 'weekly_progress' not in metrics:
+                    continue
                 
-                completed_activities = int(activities_result.data['value_num']) if activities_result.data else 0
+                completed_activities = int(metrics.get('activities_completed', 0))
+                completion_percentage = metrics['weekly_progress']
                 
-                # Estimate total activities based on completion percentage
-                completion_percentage = float(metric['value_num'])
-                total_activities = int(completed_activities / (completion_percentage / 100)) if completion_percentage > 0 else 10
+                if 'activities_scheduled' in metrics:
+                    total_activities = int(metrics['activities_scheduled'])
+                else:
+                    # Estimate total activities based on completion percentage
+                    total_activities = int(completed_activities / (completion_percentage / 100)) if completion_percentage > 0 else 10
                 
                 weekly_progress.append(WeeklyProgress(
-                    week=f"{metric['period_start']}",
+                    week=f"{period_start}",
                     total_activities=total_activities,
                     completed_activities=completed_activities,
                     completion_percentage=completion_percentage
@@ -299,112 +395,113 @@ class ContentService:
         """Get progress summary for all booklets"""
         try:
             # First verify the child belongs to the user
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
+            await get_owned_child(self.supabase, child_id, user_id)
             
-            if not result.data:
-                raise ValueError("Child not found or access denied")
-            
-            # Get all booklets with their modules and activities
-            booklets_result = self.supabase.table("booklets").select("""
-                id, title, total_modules,
-                modules(
-                    id, idx,
-                    activities(id)
-                )
-            """).execute()
-            
-            booklet_progress = []
+            summaries = await self.get_booklet_progress_for_children([child_id])
+            return summaries[child_id]
             
-            for booklet in booklets_result.data:
-                # Get activity progress for this child and booklet
-                activity_ids = []
-                total_modules = booklet.get('total_modules', 0)
-                
-                if booklet.get('modules'):
-                    for module in booklet['modules']:
-                        if module.get('activities'):
-                            activity_ids.extend([act['id'] for act in module['activities']])
-                
-                # Count completed activities
-                completed_count = 0
-                if activity_ids:
-                    progress_result = self.supabase.table("activity_progress").select("*").eq("child_id", child_id).in_("activity_id", activity_ids).eq("status", "completed").execute()
-                    completed_count = len(progress_result.data)
-                
-                # Calculate progress
-                total_activities = len(activity_ids)
-                progress_percentage = (completed_count / total_activities * 100) if total_activities > 0 else 0
-                completed_modules = int((completed_count / total_activities) * total_modules) if total_activities > 0 else 0
-                current_module = min(completed_modules + 1, total_modules)
-                
-                # Estimate completion time based on remaining work
-                remaining_modules = total_modules - completed_modules
-                estimated_weeks = max(1, remaining_modules // 2)  # Assume 2 modules per week
-                
-                if estimated_weeks <= 4:
-                    time_remaining = f"{estimated_weeks} weeks remaining"
-                else:
-                    estimated_months = max(1, estimated_weeks // 4)
-                    time_remaining = f"{estimated_months} months remaining"
-                
-                booklet_progress.append(BookletProgress(
-                    booklet_id=booklet['id'],
-                    booklet_name=booklet['title'],
-                    total_modules=total_modules,
-                    completed_modules=completed_modules,
-                    current_module=current_module,
-                    progress_percentage=round(progress_percentage, 1),
-                    estimated_completion_time=time_remaining
-                ))
+        except Exception as e:
+            logger.error(f"Failed to get booklet progress: {e}")
+            raise
+    
+    async def get_class_booklet_progress(self, class_id: str) -> Dict[str, List[BookletProgress]]:
+        """Get booklet progress summaries for every child enrolled in a class"""
+        try:
+            enrollments_result = await self.supabase.table("enrollments").select("child_id").eq("class_id", class_id).execute()
+            child_ids = [row["child_id"] for row in enrollments_result.data]
             
-            return booklet_progress
+            return await self.get_booklet_progress_for_children(child_ids)
             
         except Exception as e:
-            logger.error(f"Failed to get booklet progress: {e}")
+            logger.error(f"Failed to get class booklet progress: {e}")
             raise
     
+    async def get_booklet_progress_for_children(self, child_ids: List[str]) -> Dict[str, List[BookletProgress]]:
+        """Booklet progress summaries for many children, from one aggregated query (no ownership check)"""
+        if not child_ids:
+            return {}
+        
+        # Get all booklets with their activity IDs from the shared catalogue
+        catalogue = await booklet_catalogue.get(self.supabase)
+        
+        # Completed activity counts grouped by (child, booklet), computed in the database
+        counts_result = await self.supabase.rpc("booklet_completion_counts", {"p_child_ids": child_ids}).execute()
+        completed_counts = {
+            (row["child_id"], row["booklet_id"]): row["completed"]
+            for row in counts_result.data or []
+        }
+        
+        summaries = {}
+        for child_id in child_ids:
+            summaries[child_id] = [
+                self._summarize_booklet(
+                    booklet,
+                    total_activities=len(catalogue["activity_ids_by_booklet"][booklet['id']]),
+                    completed_count=completed_counts.get((child_id, booklet['id']), 0)
+                )
+                for booklet in catalogue["booklets"]
+            ]
+        
+        return summaries
+    
+    def _summarize_booklet(self, booklet: Dict[str, Any], total_activities: int, completed_count: int) -> BookletProgress:
+        """Turn completed/total activity counts into a booklet progress summary"""
+        total_modules = booklet.get('total_modules') or 0
+        
+        # Calculate progress
+        progress_percentage = (completed_count / total_activities * 100) if total_activities > 0 else 0
+        completed_modules = int((completed_count / total_activities) * total_modules) if total_activities > 0 else 0
+        current_module = min(completed_modules + 1, total_modules)
+        
+        # Estimate completion time based on remaining work
+        remaining_modules = total_modules - completed_modules
+        estimated_weeks = max(1, remaining_modules // 2)  # Assume 2 modules per week
+        
+        if estimated_weeks <= 4:
+            time_remaining = f"{estimated_weeks} weeks remaining"
+        else:
+            estimated_months = max(1, estimated_weeks // 4)
+            time_remaining = f"{estimated_months} months remaining"
+        
+        return BookletProgress(
+            booklet_id=booklet['id'],
+            booklet_name=booklet['title'],
+            total_modules=total_modules,
+            completed_modules=completed_modules,
+            current_module=current_module,
+            progress_percentage=round(progress_percentage, 1),
+            estimated_completion_time=time_remaining
+        )
+    
     async def save_proof_url(self, activity_id: str, child_id: str, proof_url: str, user_id: str) -> None:
         """Save proof URL without changing activity status"""
         try:
             logger.info(f"Saving proof URL for activity {activity_id}, child {child_id}, user {user_id}")
             
             # Verify parent owns child
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
+            try:
+                await get_owned_child(self.supabase, child_id, user_id)
+            except ValueError:
                 logger.error(f"Child verification failed: child {child_id} not found for user {user_id}")
-                raise ValueError("Child not found or access denied")
+                raise
             
             logger.info(f"Child verification successful for child {child_id}")
             
-            # Check if progress record already exists
-            existing_progress = self.supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity_id).execute()
+            # Insert as not_started, or only touch proof_url on an existing row,
+            # so uploading proof never changes the activity status
+            try:
+                await self.supabase.rpc("save_activity_proof", {
+                    "p_child_id": child_id,
+                    "p_activity_id": activity_id,
+                    "p_proof_url": proof_url
+                }).execute()
+                logger.info("Proof URL saved successfully")
+            except Exception as save_error:
+                logger.error(f"Proof URL upsert failed: {save_error}")
+                raise Exception(f"Failed to save progress: {save_error}")
+            
+            invalidate_user_bundle(user_id)
             
-            if existing_progress.data:
-                logger.info(f"Updating existing progress record: {existing_progress.data[0]['id']}")
-                # Update existing record with proof URL only
-                try:
-                    update_result = self.supabase.table("activity_progress").update({
-                        "proof_url": proof_url
-                    }).eq("id", existing_progress.data[0]["id"]).execute()
-                    logger.info("Progress updated successfully")
-                except Exception as update_error:
-                    logger.error(f"Update failed: {update_error}")
-                    raise Exception(f"Failed to update progress: {update_error}")
-            else:
-                logger.info("Creating new progress record")
-                # Create new record with proof URL but keep status as not_started
-                try:
-                    insert_result = self.supabase.table("activity_progress").insert({
-                        "child_id": child_id,
-                        "activity_id": activity_id,
-                        "status": "not_started",  # Don't change status just because proof is uploaded
-                        "proof_url": proof_url
-                    }).execute()
-                    logger.info("Progress record created successfully")
-                except Exception as insert_error:
-                    logger.error(f"Insert failed: {insert_error}")
-                    raise Exception(f"Failed to insert progress: {insert_error}")
-                
         except Exception as e:
             logger.error(f"Failed to save proof URL: {e}")
             raise
@@ -415,13 +512,14 @@ class ContentService:
             logger.info(f"Deleting proof image for activity {activity_id}, child {child_id}, user {user_id}")
             
             # Verify parent owns child
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
+            try:
+                await get_owned_child(self.supabase, child_id, user_id)
+            except ValueError:
                 logger.error(f"Child verification failed: child {child_id} not found for user {user_id}")
-                raise ValueError("Child not found or access denied")
+                raise
             
             # Get existing progress record to get the proof URL
-            existing_progress = self.supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity_id).execute()
+            existing_progress = await self.supabase.table("activity_progress").select("*").eq("child_id", child_id).eq("activity_id", activity_id).execute()
             
             if not existing_progress.data or not existing_progress.data[0].get("proof_url"):
                 logger.warning(f"No proof URL found for activity {activity_id}, child {child_id}")
@@ -438,7 +536,7 @@ class ContentService:
                 if filename:
                     logger.info(f"Attempting to delete file from storage: {filename}")
                     # Delete from Supabase Storage
-                    storage_response = self.supabase.storage.from_("proof-images").remove([filename])
+                    storage_response = await self.supabase.run(self.supabase.storage.from_("proof-images").remove, [filename])
                     logger.info(f"Storage delete response: {storage_response}")
                 
             except Exception as storage_error:
@@ -447,13 +545,15 @@ class ContentService:
             
             # Remove proof URL from database
             try:
-                update_result = self.supabase.table("activity_progress").update({
+                update_result = await self.supabase.table("activity_progress").update({
                     "proof_url": None
                 }).eq("id", existing_progress.data[0]["id"]).execute()
                 logger.info("Proof URL removed from database successfully")
             except Exception as update_error:
                 logger.error(f"Failed to remove proof URL from database: {update_error}")
                 raise Exception(f"Failed to remove proof URL: {update_error}")
+            
+            invalidate_user_bundle(user_id)
                 
         except Exception as e:
             logger.error(f"Failed to delete proof image: {e}")
@@ -0,0 +1,49 @@
+"""
+Content-addressed cache of VocabVenture judgements, so a resubmitted photo skips the model call
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+
+from core.cache import DiskCache, TTLCache
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_judgement_cache = TTLCache("vocabventure_judgements", maxsize=settings.JUDGEMENT_CACHE_SIZE, ttl=settings.JUDGEMENT_CACHE_TTL)
+
+# Optional second tier that survives restarts and is shared by workers on the same host
+_disk_cache: Optional[DiskCache] = None
+if settings.JUDGEMENT_CACHE_DIR:
+    try:
+        _disk_cache = DiskCache(
+            "vocabventure_judgements_disk",
+            settings.JUDGEMENT_CACHE_DIR,
+            max_bytes=settings.JUDGEMENT_CACHE_DISK_MB * 1024 * 1024,
+            ttl=settings.JUDGEMENT_CACHE_TTL
+        )
+    except OSError as e:
+        logger.warning(f"Judgement disk cache disabled: {e}")
+
+
+def judgement_key(image_sha256: str, word_of_the_day: str) -> str:
+    """SHA-256 of the decoded image bytes plus the normalised word"""
+    return f"{image_sha256}:{word_of_the_day.strip().upper()}"
+
+
+async def get_cached_judgement(key: str) -> Optional[Dict[str, Any]]:
+    """Cached judgement from memory, falling back to disk"""
+    result = _judgement_cache.get(key)
+    if result is None and _disk_cache is not None:
+        result = await asyncio.to_thread(_disk_cache.get, key)
+        if result is not None:
+            _judgement_cache.set(key, result)
+    return dict(result) if result is not None else None
+
+
+async def store_judgement(key: str, result: Dict[str, Any]) -> None:
+    """Cache a successful judgement in every tier"""
+    _judgement_cache.set(key, dict(result))
+    if _disk_cache is not None:
+        await asyncio.to_thread(_disk_cache.set, key, result)
@@ -0,0 +1,201 @@
+"""
+Games service: GPT-4o judging for VocabVenture
+"""
+
+from typing import BinaryIO, Union
+import asyncio
+import hashlib
+import logging
+
+from core.config import settings
+from core.http_client import PooledHTTPClient
+from core.images import decode_base64_image, prepare_image_data
+from services.games.judgement_cache import judgement_key, get_cached_judgement, store_judgement
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive pool per process, shared by the games and camera endpoints
+gpt4o_client = PooledHTTPClient(
+    "gpt4o",
+    max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+    timeout=settings.OPENAI_TIMEOUT,
+    connect_timeout=settings.OPENAI_CONNECT_TIMEOUT,
+    max_retries=settings.OPENAI_MAX_RETRIES,
+    backoff=settings.OPENAI_RETRY_BACKOFF
+)
+
+
+async def analyze_image_with_gpt4o(image_base64: str, word_of_the_day: str):
+    """
+    Analyze a base64 image using GPT-4o API
+    """
+    try:
+        image_bytes = decode_base64_image(image_base64)
+    except ValueError as e:
+        return {
+            "is_correct": False,
+            "feedback": f"Sorry, there was an error analyzing your image: {str(e)}",
+            "raw_response": ""
+        }
+    
+    return await judge_image(image_bytes, word_of_the_day, hashlib.sha256(image_bytes).hexdigest())
+
+
+async def judge_image(image: Union[bytes, BinaryIO], word_of_the_day: str, image_sha256: str):
+    """
+    Analyze raw image bytes or a seekable stream using GPT-4o API
+    """
+    # The same photo and word always get the same judgement, so skip the model call on repeats
+    cache_key = judgement_key(image_sha256, word_of_the_day)
+    cached = await get_cached_judgement(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        # Downscale and re-encode off the event loop; the cache key above uses the original image
+        image = await asyncio.to_thread(prepare_image_data, image)
+        
+        # Prepare headers
+        headers = {
+            "Content-Type": "application/json", 
+            "api-key": settings.OPENAI_API_KEY
+        }
+        
+        # Prepare endpoint
+        endpoint = f"{settings.OPENAI_API_BASE}/deployments/{settings.OPENAI_DEPLOYMENT}/chat/completions?api-version={settings.OPENAI_API_VERSION}"
+        
+        # Prepare system prompt
+        system_prompt = f"""
+            Role: You are a friendly and encouraging children's game AI. Your job is to judge pictures submitted by kids against a daily word. 
+            Your feedback must be positive, constructive, and simple enough for a child to understand.
+            
+            Instruction: Analyze the provided image. The "Word of the Day" is {word_of_the_day}.
+            
+            Output Format: You MUST respond in the following exact format. 
+            
+            Correct/Wrong: Correct
+            Feedback: [Your feedback text here]
+            
+            OR
+            
+            Correct/Wrong: Wrong
+            Feedback: [Your feedback text here]
+            
+            Feedback Rules:
+                
+                1. If the picture is CORRECT and clearly shows {word_of_the_day}:
+                Correct/Wrong: Correct
+                Your feedback must be a short, excited encouragement.
+                Choose one of these phrases or mix and match their style:
+                "Wow! You found a perfect {word_of_the_day}! Great job!"
+                "That's it! A fantastic {word_of_the_day}! You're a superstar!"
+                "Well done! I recognized that {word_of_the_day} right away!"
+                "Perfect! That's exactly what a {word_of_the_day} looks like! 🎉"
+                
+                2. If the picture is WRONG and shows something else (e.g., a toy):
+                
+                Correct/Wrong: Wrong
+                First, gently identify what you see. "I see a [object name]!"
+                Then, provide a simple, guiding hint. Frame it as a fun clue, not a correction.
+                Finally, encourage them to try again.
+                Formula:"I see a [object name]! Try looking for something that [hint about {word_of_the_day}]. Can you try again?"
+                    
+                    Example Hints:
+                            If {word_of_the_day} is elephant: "...something with a big trunk and floppy ears."
+                            
+                            If {word_of_the_day} is apple: "...something red or green that grows on a tree and is yummy to eat."
+                            
+                            If {word_of_the_day} is book: "...something with pages that we read stories from."
+                
+                3. If the image is unclear, blurry, or you cannot identify the main object:
+                    Correct/Wrong: Wrong
+                    Feedback: "Hmm, my robot eyes are having a little trouble seeing this clearly! Could you take another picture so I can get a better look? I'm looking for a {word_of_the_day}!"
+        
+        
+        
+        
+        """
+        
+        # Prepare request payload
+        payload = {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": f"Please analyze this image for the word '{word_of_the_day}'"
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": image["data_url"]
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": 200,
+            "temperature": 0.7
+        }
+        
+        # Make API call through the shared pool (bounded concurrency, retries on 429/5xx)
+        result = await gpt4o_client.post_json(endpoint, payload, headers=headers)
+        
+        # Parse response
+        content = result['choices'][0]['message']['content']
+        
+        # Parse the response to extract Correct/Wrong and feedback
+        lines = content.strip().split('\n')
+        is_correct = False
+        feedback = ""
+        
+        logger.debug(f"🎯 AI Raw Response: {content}")
+        logger.debug(f"🎯 Number of lines: {len(lines)}")
+        
+        for i, line in enumerate(lines):
+            line = line.strip()
+            logger.debug(f"🎯 Line {i}: '{line}'")
+            
+            if line.lower().startswith('correct/wrong:'):
+                logger.debug(f"🎯 Found Correct/Wrong line: '{line}'")
+                # Handle "Correct/Wrong: Correct" format
+                if ': correct' in line.lower():
+                    is_correct = True
+                    logger.debug(f"🎯 Setting is_correct = True")
+                elif ': wrong' in line.lower():
+                    is_correct = False
+                    logger.debug(f"🎯 Setting is_correct = False")
+            elif line.lower().startswith('correct:'):
+                is_correct = True
+                logger.debug(f"🎯 Found 'Correct:' line, setting is_correct = True")
+            elif line.lower().startswith('wrong:'):
+                is_correct = False
+                logger.debug(f"🎯 Found 'Wrong:' line, setting is_correct = False")
+            elif line.lower().startswith('feedback:'):
+                feedback = line.replace('Feedback:', '').replace('feedback:', '').strip()
+                logger.debug(f"🎯 Found feedback line: '{feedback}'")
+            elif feedback == "" and line and not line.lower().startswith('correct') and not line.lower().startswith('wrong') and not line.lower().startswith('correct/wrong'):
+                feedback = line
+                logger.debug(f"🎯 Using line as feedback: '{feedback}'")
+        
+        logger.debug(f"🎯 Final parsed result - is_correct: {is_correct}, feedback: {feedback}")
+        
+        result = {
+            "is_correct": is_correct,
+            "feedback": feedback,
+            "raw_response": content
+        }
+        await store_judgement(cache_key, result)
+        return result
+    
+    except Exception as e:
+        return {
+            "is_correct": False,
+            "feedback": f"Sorry, there was an error analyzing your image: {str(e)}",
+            "raw_response": ""
+        }
@@ -8,7 +8,6 @@ from typing import List
 import logging
 
 from core.auth import get_current_user, get_current_parent, AuthUser
-from core.database import get_supabase_client
 from models.profiles import (
     Profile, ProfileCreate, ProfileUpdate, 
     Child, ChildCreate, ChildUpdate,
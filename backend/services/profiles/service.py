@@ -8,7 +8,10 @@ import uuid
 import logging
 from datetime import datetime
 
-from core.database import get_supabase_client
+from core.auth import invalidate_cached_user
+from core.database import get_async_supabase_client
+from core.ownership import get_owned_child, invalidate_owned_children
+from services.user.bundle_cache import invalidate_user_bundle
 from models.profiles import (
     Profile, ProfileCreate, ProfileUpdate,
     Child, ChildCreate, ChildUpdate,
@@ -22,13 +25,13 @@ class ProfileService:
     """Service for profile and children management"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.supabase = get_async_supabase_client()
     
     async def get_user_profile_with_children(self, user_id: str) -> MeResponse:
         """Get user profile with associated children and classes"""
         try:
             # Get profile
-            profile_result = self.supabase.table("profiles").select("*").eq("user_id", user_id).execute()
+            profile_result = await self.supabase.table("profiles").select("*").eq("user_id", user_id).execute()
             
             if not profile_result.data:
                 logger.warning(f"No profile found for user {user_id}, creating default profile object")
@@ -50,7 +53,7 @@ class ProfileService:
             # Get classes (for teachers)
             classes = []
             if profile.role == "teacher":
-                classes_result = self.supabase.table("classes").select("*").execute()
+                classes_result = await self.supabase.table("classes").select("*").execute()
                 classes = [Class(**cls) for cls in classes_result.data]
             
             return MeResponse(
@@ -68,11 +71,14 @@ class ProfileService:
         try:
             update_data = profile_update.model_dump(exclude_unset=True)
             
-            result = self.supabase.table("profiles").update(update_data).eq("user_id", user_id).execute()
+            result = await self.supabase.table("profiles").update(update_data).eq("user_id", user_id).execute()
             
             if not result.data:
                 raise ValueError("Profile not found")
             
+            invalidate_cached_user(user_id)
+            invalidate_user_bundle(user_id)
+            
             return Profile(**result.data[0])
             
         except Exception as e:
@@ -83,7 +89,7 @@ class ProfileService:
         """Get children with their class information"""
         try:
             # Get children
-            children_result = self.supabase.table("children").select("*").eq("parent_user_id", parent_user_id).execute()
+            children_result = await self.supabase.table("children").select("*").eq("parent_user_id", parent_user_id).execute()
             
             children_with_classes = []
             
@@ -91,7 +97,7 @@ class ProfileService:
                 child = Child(**child_data)
                 
                 # Get class information for this child
-                enrollment_result = self.supabase.table("enrollments").select("""
+                enrollment_result = await self.supabase.table("enrollments").select("""
                     class_id,
                     classes (
                         id,
@@ -125,18 +131,19 @@ class ProfileService:
             child_dict["parent_user_id"] = parent_user_id
             child_dict["id"] = str(uuid.uuid4())
             
-            result = self.supabase.table("children").insert(child_dict).execute()
+            result = await self.supabase.table("children").insert(child_dict).execute()
             
             if not result.data:
                 raise ValueError("Failed to create child")
             
             # Create token account for the child
             token_account_data = {
-                "child_id": child_dict["id"],
-                "balance": 0,
-                "weekly_earned": 0
+                "child_id": child_dict["id"]
             }
-            self.supabase.table("token_accounts").insert(token_account_data).execute()
+            await self.supabase.table("token_accounts").insert(token_account_data).execute()
+            
+            invalidate_owned_children(parent_user_id)
+            invalidate_user_bundle(parent_user_id)
             
             return Child(**result.data[0])
             
@@ -148,14 +155,14 @@ class ProfileService:
         """Update child profile"""
         try:
             # Verify parent owns this child
-            child_result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", parent_user_id).execute()
-            
-            if not child_result.data:
-                raise ValueError("Child not found or access denied")
+            await get_owned_child(self.supabase, child_id, parent_user_id)
             
             update_data = child_update.model_dump(exclude_unset=True)
             
-            result = self.supabase.table("children").update(update_data).eq("id", child_id).execute()
+            result = await self.supabase.table("children").update(update_data).eq("id", child_id).execute()
+            
+            invalidate_owned_children(parent_user_id)
+            invalidate_user_bundle(parent_user_id)
             
             return Child(**result.data[0])
             
@@ -167,13 +174,10 @@ class ProfileService:
         """Enroll child in a class using class code"""
         try:
             # Verify parent owns this child
-            child_result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", parent_user_id).execute()
-            
-            if not child_result.data:
-                raise ValueError("Child not found or access denied")
+            await get_owned_child(self.supabase, child_id, parent_user_id)
             
             # Find class by code (assuming class name is used as code for now)
-            class_result = self.supabase.table("classes").select("*").eq("name", class_code).execute()
+            class_result = await self.supabase.table("classes").select("*").eq("name", class_code).execute()
             
             if not class_result.data:
                 raise ValueError("Class not found")
@@ -181,7 +185,7 @@ class ProfileService:
             class_id = class_result.data[0]["id"]
             
             # Check if already enrolled
-            existing_enrollment = self.supabase.table("enrollments").select("*").eq("child_id", child_id).eq("class_id", class_id).execute()
+            existing_enrollment = await self.supabase.table("enrollments").select("*").eq("child_id", child_id).eq("class_id", class_id).execute()
             
             if existing_enrollment.data:
                 raise ValueError("Child is already enrolled in this class")
@@ -192,7 +196,9 @@ class ProfileService:
                 "class_id": class_id
             }
             
-            self.supabase.table("enrollments").insert(enrollment_data).execute()
+            await self.supabase.table("enrollments").insert(enrollment_data).execute()
+            
+            invalidate_user_bundle(parent_user_id)
             
         except Exception as e:
             logger.error(f"Failed to enroll child in class: {e}")
@@ -201,7 +207,7 @@ class ProfileService:
     async def get_available_classes(self) -> List[Class]:
         """Get all available classes"""
         try:
-            result = self.supabase.table("classes").select("*").execute()
+            result = await self.supabase.table("classes").select("*").execute()
             return [Class(**cls) for cls in result.data]
             
         except Exception as e:
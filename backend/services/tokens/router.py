@@ -7,7 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List
 import logging
 
-from core.auth import get_current_user, get_current_parent, AuthUser
+from core.auth import get_current_user, get_current_parent, get_current_admin, AuthUser
 from models.tokens import (
     TokenBalance, ShopItem, RedeemTokensRequest,
     TokenHistoryResponse, Redemption
@@ -66,7 +66,7 @@ async def redeem_tokens(
         return await service.redeem_tokens(
             redemption_data.child_id,
             redemption_data.item_id, 
-            redemption_data.quantity,
+            redemption_data.qty,
             current_user.user_id
         )
     except ValueError as e:
@@ -103,4 +103,38 @@ async def get_token_history(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve token history"
-        ) 
\ No newline at end of file
+        )
+
+
+@router.post("/admin/roll-snapshots")
+async def roll_balance_snapshots(
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Weekly rollover of token balance snapshots (run by the scheduler after the week starts)"""
+    try:
+        service = TokensService()
+        rolled = await service.roll_balance_snapshots()
+        return {"message": "Token balance snapshots rolled", "data": {"accounts": rolled}}
+    except Exception as e:
+        logger.error(f"Failed to roll token balance snapshots: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to roll token balance snapshots"
+        )
+
+
+@router.post("/admin/rebuild-balances")
+async def rebuild_balance_snapshots(
+    current_user: AuthUser = Depends(get_current_admin)
+):
+    """Recompute every account's balance snapshot from the full ledger"""
+    try:
+        service = TokensService()
+        rebuilt = await service.rebuild_balance_snapshots()
+        return {"message": "Token balance snapshots rebuilt", "data": {"accounts": rebuilt}}
+    except Exception as e:
+        logger.error(f"Failed to rebuild token balance snapshots: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to rebuild token balance snapshots"
+        )
@@ -7,49 +7,51 @@ from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime, date, timedelta
 
-from core.database import get_supabase_client
+from postgrest.exceptions import APIError
+
+from core.config import settings
+from core.database import get_async_supabase_client
+from core.pagination import apply_keyset, keyset_page
+from core.ownership import get_owned_child
+from services.user.bundle_cache import invalidate_user_bundle
 
 logger = logging.getLogger(__name__)
 
+# SQLSTATE raised by redeem_shop_item when a redemption is refused
+REDEMPTION_REJECTED = "P0001"
+
 
 class TokensService:
     """Service for token management"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.supabase = get_async_supabase_client()
     
     async def get_token_balance(self, child_id: str, user_id: str) -> Dict[str, Any]:
         """Get token balance for a child"""
         try:
             # Verify child belongs to user
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
-                raise ValueError("Child not found or access denied")
-            
-            child = result.data[0]
+            child = await get_owned_child(self.supabase, child_id, user_id)
             
             # Get token account info
-            token_result = self.supabase.table("token_accounts").select("*").eq("child_id", child_id).execute()
+            token_result = await self.supabase.table("token_accounts").select("child_id, rank_percentile").eq("child_id", child_id).execute()
             
             if not token_result.data:
                 # Create token account if it doesn't exist
-                self.supabase.table("token_accounts").insert({
+                await self.supabase.table("token_accounts").insert({
                     "child_id": child_id,
-                    "balance": 0,
-                    "weekly_earned": 0,
                     "rank_percentile": 0.0
                 }).execute()
                 
-                token_info = {
-                    "balance": 0,
-                    "weekly_earned": 0,
-                    "rank_percentile": 0.0
-                }
+                token_info = {"rank_percentile": 0.0}
             else:
                 token_info = token_result.data[0]
             
+            # Balances are derived from the ledger
+            token_info.update((await self.get_balances([child_id]))[child_id])
+            
             # Get recent transactions
-            transactions_result = self.supabase.table("token_transactions").select("*").eq("account_id", child_id).order("created_at", desc=True).limit(10).execute()
+            transactions_result = await self.supabase.table("token_transactions").select("*").eq("account_id", child_id).order("created_at", desc=True).limit(10).execute()
             
             transactions = []
             for trans in transactions_result.data:
@@ -66,7 +68,7 @@ class TokensService:
                 "child_name": child.get("nickname", "Child"),
                 "balance": token_info["balance"],
                 "weekly_earned": token_info["weekly_earned"],
-                "rank_percentile": float(token_info.get("rank_percentile", 0.0)),
+                "rank_percentile": float(token_info.get("rank_percentile") or 0.0),
                 "recent_transactions": transactions
             }
             
@@ -74,10 +76,59 @@ class TokensService:
             logger.error(f"Failed to get token balance: {e}")
             raise
     
+    async def get_balances(self, child_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """Balance and weekly earnings per child, from the latest snapshot plus the ledger tail"""
+        result = await self.supabase.rpc("token_balances", {"p_child_ids": child_ids}).execute()
+        balances = {child_id: {"balance": 0, "weekly_earned": 0} for child_id in child_ids}
+        for row in result.data or []:
+            balances[row["child_id"]] = {"balance": row["balance"], "weekly_earned": row["weekly_earned"]}
+        return balances
+    
+    async def roll_balance_snapshots(self) -> int:
+        """Weekly rollover: snapshot every account at the start of the current week"""
+        try:
+            result = await self.supabase.rpc("roll_token_snapshots", {}).execute()
+            rolled = result.data or 0
+            logger.info(f"Rolled token balance snapshots, {rolled} accounts snapshotted")
+            return rolled
+            
+        except Exception as e:
+            logger.error(f"Failed to roll token balance snapshots: {e}")
+            raise
+    
+    async def rebuild_balance_snapshots(self, batch_size: int = settings.TOKEN_REBUILD_BATCH_SIZE) -> int:
+        """Recompute every account's snapshot from the full ledger, one batch of accounts at a time"""
+        try:
+            rebuilt = 0
+            last_child_id = None
+            
+            while True:
+                query = self.supabase.table("token_accounts").select("child_id").order("child_id").limit(batch_size)
+                if last_child_id:
+                    query = query.gt("child_id", last_child_id)
+                
+                batch = [row["child_id"] for row in (await query.execute()).data]
+                if not batch:
+                    break
+                
+                result = await self.supabase.rpc("rebuild_token_snapshots", {"p_account_ids": batch}).execute()
+                rebuilt += result.data or 0
+                last_child_id = batch[-1]
+                logger.info(f"Rebuilt token balance snapshots for {rebuilt} accounts")
+                
+                if len(batch) < batch_size:
+                    break
+            
+            return rebuilt
+            
+        except Exception as e:
+            logger.error(f"Failed to rebuild token balance snapshots: {e}")
+            raise
+    
     async def get_shop_items(self) -> List[Dict[str, Any]]:
         """Get available shop items"""
         try:
-            result = self.supabase.table("shop_items").select("*").eq("is_active", True).execute()
+            result = await self.supabase.table("shop_items").select("*").eq("is_active", True).execute()
             
             items = []
             for item in result.data:
@@ -100,66 +151,33 @@ class TokensService:
         """Redeem tokens for a shop item"""
         try:
             # Verify child belongs to user
-            child_result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not child_result.data:
-                raise ValueError("Child not found or access denied")
-            
-            # Get shop item
-            item_result = self.supabase.table("shop_items").select("*").eq("id", item_id).eq("is_active", True).execute()
-            if not item_result.data:
-                raise ValueError("Shop item not found or not available")
-            
-            item = item_result.data[0]
-            total_cost = item["price"] * quantity
-            
-            # Check inventory if applicable
-            if item.get("inventory_qty") is not None and item["inventory_qty"] < quantity:
-                raise ValueError("Insufficient inventory")
-            
-            # Get token balance
-            token_result = self.supabase.table("token_accounts").select("*").eq("child_id", child_id).execute()
-            if not token_result.data or token_result.data[0]["balance"] < total_cost:
-                raise ValueError("Insufficient tokens")
-            
-            current_balance = token_result.data[0]["balance"]
-            
-            # Process redemption in a transaction-like manner
-            # 1. Create redemption record
-            redemption_result = self.supabase.table("redemptions").insert({
-                "account_id": child_id,
-                "item_id": item_id,
-                "qty": quantity,
-                "status": "requested"
-            }).execute()
-            
-            # 2. Deduct tokens
-            self.supabase.table("token_accounts").update({
-                "balance": current_balance - total_cost
-            }).eq("child_id", child_id).execute()
-            
-            # 3. Add transaction record
-            self.supabase.table("token_transactions").insert({
-                "account_id": child_id,
-                "delta": -total_cost,
-                "reason": "purchase",
-                "ref_table": "redemptions",
-                "ref_id": redemption_result.data[0]["id"],
-                "actor_id": user_id
-            }).execute()
-            
-            # 4. Update inventory if applicable
-            if item.get("inventory_qty") is not None:
-                self.supabase.table("shop_items").update({
-                    "inventory_qty": item["inventory_qty"] - quantity
-                }).eq("id", item_id).execute()
+            await get_owned_child(self.supabase, child_id, user_id)
+            
+            # Stock check, balance deduction, redemption and ledger entry run as
+            # one database transaction; see redeem_shop_item in schema.sql
+            try:
+                result = await self.supabase.rpc("redeem_shop_item", {
+                    "p_child_id": child_id,
+                    "p_item_id": item_id,
+                    "p_qty": quantity,
+                    "p_actor_id": user_id
+                }).execute()
+            except APIError as e:
+                if e.code == REDEMPTION_REJECTED:
+                    raise ValueError(e.message)
+                raise
+            
+            redemption = result.data[0]
+            
+            invalidate_user_bundle(user_id)
             
             return {
                 "message": "Redemption successful",
-                "redemption_id": redemption_result.data[0]["id"],
-                "item_name": item["name"],
+                "redemption_id": redemption["redemption_id"],
+                "item_name": redemption["item_name"],
                 "quantity": quantity,
-                "cost": total_cost,
-                "remaining_balance": current_balance - total_cost
+                "cost": redemption["cost"],
+                "remaining_balance": redemption["remaining_balance"]
             }
             
         except Exception as e:
@@ -170,25 +188,17 @@ class TokensService:
         """Get token transaction history for a child"""
         try:
             # Verify child belongs to user
-            result = self.supabase.table("children").select("*").eq("id", child_id).eq("parent_user_id", user_id).execute()
-            if not result.data:
-                raise ValueError("Child not found or access denied")
-            
-            # Build query for token transactions
-            query = (
-                self.supabase.table("token_transactions")
-                .select("*")
-                .eq("account_id", child_id)
-                .order("created_at", desc=True)
-                .limit(limit)
-            )
+            await get_owned_child(self.supabase, child_id, user_id)
             
-            # Apply cursor if provided (for pagination)
-            if cursor:
-                query = query.gt("created_at", cursor)
+            # Build query for token transactions, keyset-paginated on (created_at, id)
+            query = apply_keyset(
+                self.supabase.table("token_transactions").select("*").eq("account_id", child_id),
+                cursor,
+                limit
+            )
             
-            transaction_result = query.execute()
-            transactions = transaction_result.data or []
+            transaction_result = await query.execute()
+            transactions, next_cursor, has_more = keyset_page(transaction_result.data or [], limit)
             
             # Format transactions for frontend
             formatted_transactions = []
@@ -201,10 +211,6 @@ class TokensService:
                     "created_at": transaction["created_at"]
                 })
             
-            # Determine if there are more results
-            has_more = len(transactions) == limit
-            next_cursor = transactions[-1]["created_at"] if transactions and has_more else None
-            
             return {
                 "transactions": formatted_transactions,
                 "next_cursor": next_cursor,
@@ -232,5 +238,7 @@ class TokensService:
             return f"Shop purchase"
         elif reason == "gift":
             return f"Gift received"
+        elif reason == "adjustment":
+            return f"Balance adjustment"
         else:
             return f"{reason.replace('_', ' ').title()}"
@@ -0,0 +1,57 @@
+"""
+Short-lived cache of assembled user bundles, with ETags for conditional GETs
+"""
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+
+from core.cache import TTLCache
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_bundle_cache = TTLCache("user_bundles", maxsize=settings.BUNDLE_CACHE_SIZE, ttl=settings.BUNDLE_CACHE_TTL)
+
+
+def compute_bundle_etag(bundle_data: Dict[str, Any]) -> str:
+    """Strong ETag derived from the bundle content"""
+    encoded = json.dumps(bundle_data, sort_keys=True, default=str).encode("utf-8")
+    return f'"{hashlib.sha256(encoded).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as conditional GETs use"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def get_cached_bundle(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get the cached bundle entry ({etag, data, built_at}) for a user"""
+    return _bundle_cache.get(user_id)
+
+
+def bundle_entry(bundle_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Entry ({etag, data, built_at}) for a freshly built bundle, without caching it"""
+    return {
+        "etag": compute_bundle_etag(bundle_data),
+        "data": bundle_data,
+        "built_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def store_bundle(user_id: str, bundle_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache a freshly built bundle and return its entry"""
+    entry = bundle_entry(bundle_data)
+    _bundle_cache.set(user_id, entry)
+    return entry
+
+
+def invalidate_user_bundle(user_id: str) -> None:
+    """Drop a user's cached bundle after data it contains has changed"""
+    _bundle_cache.invalidate(user_id)
@@ -2,87 +2,149 @@
 User bundle router - provides all user data in one call
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
+from typing import Optional, Tuple
+import asyncio
 import logging
 
 from core.auth import get_current_user, AuthUser
+from core.config import settings
 from services.profiles.service import ProfileService
 from services.content.service import ContentService
 from services.tokens.service import TokensService
+from .bundle_cache import get_cached_bundle, store_bundle, bundle_entry, etag_matches
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+async def _load_section(coro, label: str):
+    """Await one bundle section with the per-section timeout"""
+    try:
+        return await asyncio.wait_for(coro, timeout=settings.BUNDLE_SECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"{label} timed out after {settings.BUNDLE_SECTION_TIMEOUT}s")
+
+
+async def _load_child_data(child_id: str, user_id: str, content_service: ContentService, token_service: TokensService, limiter: asyncio.Semaphore):
+    """Load booklets and token account for one child, returning (booklets, token_account, complete)"""
+    async with limiter:
+        logger.info(f"Fetching data for child: {child_id}")
+        
+        # Both sections load concurrently; failures are reported per section below
+        booklets_result, token_result = await asyncio.gather(
+            _load_section(
+                content_service.get_booklets_with_progress(week=None, child_id=child_id, user_id=user_id),
+                "booklets"
+            ),
+            _load_section(
+                token_service.get_token_balance(child_id, user_id),
+                "token balance"
+            ),
+            return_exceptions=True
+        )
+    
+    if isinstance(booklets_result, Exception):
+        logger.error(f"Error fetching data for child {child_id}: {booklets_result}")
+        # Skip this child, continue with the others
+        return [], None, False
+    
+    booklets = []
+    for booklet in booklets_result:
+        # Add child_id to booklets for frontend reference
+        booklet_dict = booklet.dict() if hasattr(booklet, 'dict') else booklet
+        booklet_dict["child_id"] = child_id
+        booklets.append(booklet_dict)
+    
+    token_account = None
+    complete = True
+    if isinstance(token_result, Exception):
+        logger.warning(f"Could not fetch tokens for child {child_id}: {token_result}")
+        # Continue without tokens - not critical
+        complete = False
+    elif token_result:
+        token_account = token_result.dict() if hasattr(token_result, 'dict') else token_result
+    
+    return booklets, token_account, complete
+
+
+async def _build_user_bundle(user_id: str) -> Tuple[dict, bool]:
+    """Assemble profile, children, booklets and token accounts for a user; also says whether every child loaded"""
+    # Initialize services
+    profile_service = ProfileService()
+    content_service = ContentService()
+    token_service = TokensService()
+    
+    # Get user profile and children
+    logger.info("Fetching user profile...")
+    user_data = await profile_service.get_user_profile_with_children(user_id)
+    
+    bundle_data = {
+        "profile": user_data.profile.dict() if hasattr(user_data.profile, 'dict') else user_data.profile.__dict__,
+        "children": [child.dict() if hasattr(child, 'dict') else child.__dict__ for child in user_data.children],
+        "booklets": [],
+        "token_accounts": [],
+        "recent_activity": []
+    }
+    complete = True
+    
+    # If user has children, get their learning data and token accounts concurrently
+    if user_data.children:
+        limiter = asyncio.Semaphore(settings.BUNDLE_CONCURRENCY)
+        child_ids = [child.id if hasattr(child, 'id') else child["id"] for child in user_data.children]
+        
+        child_results = await asyncio.gather(*[
+            _load_child_data(child_id, user_id, content_service, token_service, limiter)
+            for child_id in child_ids
+        ])
+        
+        # gather keeps the children's order
+        for booklets, token_account, child_complete in child_results:
+            complete = complete and child_complete
+            bundle_data["booklets"].extend(booklets)
+            if token_account:
+                bundle_data["token_accounts"].append(token_account)
+    
+    logger.info(f"Successfully fetched bundle data with {len(bundle_data['booklets'])} booklets and {len(bundle_data['token_accounts'])} token accounts")
+    
+    return bundle_data, complete
+
+
 @router.get("/bundle")
 async def get_user_bundle(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: AuthUser = Depends(get_current_user)
 ):
     """
     Get all user data needed for Home, Learn, and Token pages in one call
+    
+    Responses carry an ETag; sending it back in If-None-Match returns 304
+    when the bundle has not changed.
     """
     try:
         logger.info(f"Fetching user bundle for user: {current_user.user_id}")
         
-        # Initialize services
-        profile_service = ProfileService()
-        content_service = ContentService()
-        token_service = TokensService()
-        
-        # Get user profile and children
-        logger.info("Fetching user profile...")
-        user_data = await profile_service.get_user_profile_with_children(current_user.user_id)
+        entry = get_cached_bundle(current_user.user_id)
+        if entry is None:
+            bundle_data, complete = await _build_user_bundle(current_user.user_id)
+            # A child that failed to load would otherwise stay missing for the whole TTL
+            entry = store_bundle(current_user.user_id, bundle_data) if complete else bundle_entry(bundle_data)
+        else:
+            logger.info("Serving user bundle from cache")
         
-        bundle_data = {
-            "profile": user_data.profile.dict() if hasattr(user_data.profile, 'dict') else user_data.profile.__dict__,
-            "children": [child.dict() if hasattr(child, 'dict') else child.__dict__ for child in user_data.children],
-            "booklets": [],
-            "token_accounts": [],
-            "recent_activity": []
-        }
+        headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
         
-        # If user has children, get their learning data and token accounts
-        if user_data.children:
-            for child in user_data.children:
-                child_id = child.id if hasattr(child, 'id') else child["id"]
-                logger.info(f"Fetching data for child: {child_id}")
-                
-                try:
-                    # Get booklets with progress for this child
-                    child_booklets = await content_service.get_booklets_with_progress(
-                        week=None, 
-                        child_id=child_id, 
-                        user_id=current_user.user_id
-                    )
-                    
-                    # Add child_id to booklets for frontend reference
-                    for booklet in child_booklets:
-                        booklet_dict = booklet.dict() if hasattr(booklet, 'dict') else booklet
-                        booklet_dict["child_id"] = child_id
-                        bundle_data["booklets"].append(booklet_dict)
-                    
-                    # Get token account for this child
-                    try:
-                        token_balance = await token_service.get_token_balance(child_id, current_user.user_id)
-                        if token_balance:
-                            token_dict = token_balance.dict() if hasattr(token_balance, 'dict') else token_balance
-                            bundle_data["token_accounts"].append(token_dict)
-                    except Exception as token_error:
-                        logger.warning(f"Could not fetch tokens for child {child_id}: {token_error}")
-                        # Continue without tokens - not critical
-                    
-                except Exception as child_error:
-                    logger.error(f"Error fetching data for child {child_id}: {child_error}")
-                    # Continue with other children
-                    continue
+        if if_none_match and etag_matches(if_none_match, entry["etag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
         
-        logger.info(f"Successfully fetched bundle data with {len(bundle_data['booklets'])} booklets and {len(bundle_data['token_accounts'])} token accounts")
+        response.headers.update(headers)
         
         return {
             "success": True,
-            "data": bundle_data,
-            "cache_timestamp": None  # Frontend can set this
+            "data": entry["data"],
+            "cache_timestamp": entry["built_at"]
         }
         
     except Exception as e:
@@ -97,59 +159,9 @@ async def get_user_bundle(
 async def test_bundle(user_id: str):
     """Test bundle endpoint with specific user ID"""
     try:
-        profile_service = ProfileService()
-        content_service = ContentService()
-        token_service = TokensService()
-        
         logger.info(f"Testing bundle for user: {user_id}")
         
-        # Get user profile and children
-        logger.info("Fetching user profile...")
-        user_data = await profile_service.get_user_profile_with_children(user_id)
-        
-        bundle_data = {
-            "profile": user_data.profile.dict() if hasattr(user_data.profile, 'dict') else user_data.profile.__dict__,
-            "children": [child.dict() if hasattr(child, 'dict') else child.__dict__ for child in user_data.children],
-            "booklets": [],
-            "token_accounts": [],
-            "recent_activity": []
-        }
-        
-        # If user has children, get their learning data and token accounts
-        if user_data.children:
-            for child in user_data.children:
-                child_id = child.id if hasattr(child, 'id') else child["id"]
-                logger.info(f"Fetching data for child: {child_id}")
-                
-                try:
-                    # Get child's booklets
-                    child_booklets = await content_service.get_child_booklets(
-                        child_id=child_id, 
-                        user_id=user_id
-                    )
-                    
-                    # Add child_id to booklets for frontend reference
-                    for booklet in child_booklets:
-                        booklet_dict = booklet.dict() if hasattr(booklet, 'dict') else booklet
-                        booklet_dict["child_id"] = child_id
-                        bundle_data["booklets"].append(booklet_dict)
-                    
-                    # Get token account for this child
-                    try:
-                        token_balance = await token_service.get_token_balance(child_id, user_id)
-                        if token_balance:
-                            token_dict = token_balance.dict() if hasattr(token_balance, 'dict') else token_balance
-                            bundle_data["token_accounts"].append(token_dict)
-                    except Exception as token_error:
-                        logger.warning(f"Could not fetch tokens for child {child_id}: {token_error}")
-                        # Continue without tokens - not critical
-                    
-                except Exception as child_error:
-                    logger.error(f"Error fetching data for child {child_id}: {child_error}")
-                    # Continue with other children
-                    continue
-        
-        logger.info(f"Successfully fetched bundle data with {len(bundle_data['booklets'])} booklets and {len(bundle_data['token_accounts'])} token accounts")
+        bundle_data, _ = await _build_user_bundle(user_id)
         
         return {
             "success": True,
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for token redemption against a real Supabase project.
+Fires many redemptions for one child at once and checks that balance, stock,
+redemptions and the ledger all agree afterwards (no double-spend, no oversell).
+
+Usage: python stress_token_redemption.py --child-id <uuid> [--requests 60]
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+from core.database import get_async_supabase_client
+from services.tokens.service import TokensService
+
+
+async def run_stress_test(child_id: str, requests: int, balance: int, price: int, stock: int) -> bool:
+    supabase = get_async_supabase_client()
+    
+    print("🧪 Token redemption stress test")
+    print("=" * 40)
+    
+    child_result = await supabase.table("children").select("id, parent_user_id").eq("id", child_id).execute()
+    if not child_result.data:
+        print(f"❌ Child {child_id} not found")
+        return False
+    parent_user_id = child_result.data[0]["parent_user_id"]
+    
+    account_result = await supabase.table("token_accounts").select("child_id").eq("child_id", child_id).execute()
+    if not account_result.data:
+        print(f"❌ Child {child_id} has no token account")
+        return False
+    original_balance = (await TokensService().get_balances([child_id]))[child_id]["balance"]
+    
+    # Fixture: a known balance (via a ledger adjustment) and a limited-stock item
+    adjustment_result = await supabase.table("token_transactions").insert({
+        "account_id": child_id,
+        "delta": balance - original_balance,
+        "reason": "adjustment",
+        "ref_table": "token_accounts"
+    }).execute()
+    adjustment_id = adjustment_result.data[0]["id"]
+    item_result = await supabase.table("shop_items").insert({
+        "name": "Stress test item",
+        "category": "Test",
+        "price": price,
+        "inventory_qty": stock,
+        "is_active": True
+    }).execute()
+    item_id = item_result.data[0]["id"]
+    expected = min(stock, balance // price)
+    
+    print(f"💰 Balance {balance}, price {price}, stock {stock}: at most {expected} redemptions can succeed")
+    print(f"🚀 Firing {requests} concurrent redemptions...")
+    
+    ok = True
+    try:
+        service = TokensService()
+        outcomes = await asyncio.gather(
+            *(service.redeem_tokens(child_id, item_id, 1, parent_user_id) for _ in range(requests)),
+            return_exceptions=True
+        )
+        
+        successes = [o for o in outcomes if isinstance(o, dict)]
+        rejections = Counter(str(o) for o in outcomes if isinstance(o, ValueError))
+        errors = [o for o in outcomes if isinstance(o, Exception) and not isinstance(o, ValueError)]
+        
+        print(f"✅ {len(successes)} succeeded")
+        for message, count in rejections.items():
+            print(f"🚫 {count} rejected: {message}")
+        for error in errors:
+            print(f"💥 Unexpected error: {error}")
+        
+        final_balance = (await service.get_balances([child_id]))[child_id]["balance"]
+        final_stock = (await supabase.table("shop_items").select("inventory_qty").eq("id", item_id).execute()).data[0]["inventory_qty"]
+        redemption_ids = [r["id"] for r in (await supabase.table("redemptions").select("id").eq("item_id", item_id).execute()).data]
+        ledger = (await supabase.table("token_transactions").select("delta").in_("ref_id", redemption_ids).execute()).data if redemption_ids else []
+        
+        checks = {
+            "no unexpected errors": not errors,
+            f"exactly {expected} redemptions succeeded": len(successes) == expected,
+            "balance matches successful redemptions": final_balance == balance - len(successes) * price,
+            "balance never went negative": final_balance >= 0,
+            "stock matches successful redemptions": final_stock == stock - len(successes),
+            "one redemption row per success": len(redemption_ids) == len(successes),
+            "ledger matches balance change": sum(row["delta"] for row in ledger) == final_balance - balance
+        }
+        
+        print()
+        for name, passed in checks.items():
+            print(f"{'✅' if passed else '❌'} {name}")
+        ok = all(checks.values())
+        
+        # Remove what the test created
+        if redemption_ids:
+            await supabase.table("token_transactions").delete().in_("ref_id", redemption_ids).execute()
+            await supabase.table("redemptions").delete().in_("id", redemption_ids).execute()
+    finally:
+        await supabase.table("shop_items").delete().eq("id", item_id).execute()
+        await supabase.table("token_transactions").delete().eq("id", adjustment_id).execute()
+    
+    print()
+    print("🎉 No double-spend detected" if ok else "❌ Redemption is not contention-safe")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent token redemption stress test")
+    parser.add_argument("--child-id", required=True, help="Child with a token account to test against")
+    parser.add_argument("--requests", type=int, default=60, help="Concurrent redemption requests")
+    parser.add_argument("--balance", type=int, default=100, help="Balance to start from")
+    parser.add_argument("--price", type=int, default=10, help="Price of the test item")
+    parser.add_argument("--stock", type=int, default=15, help="Inventory of the test item")
+    args = parser.parse_args()
+    
+    ok = asyncio.run(run_stress_test(args.child_id, args.requests, args.balance, args.price, args.stock))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
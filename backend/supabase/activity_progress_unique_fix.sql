@@ -0,0 +1,34 @@
+-- Enforce one progress row per (child, activity)
+-- Run this in Supabase SQL Editor on databases created before the unique constraint existed.
+-- Progress writes, including the bulk progress endpoint, upsert on (child_id, activity_id)
+-- and fail without it, so run this before deploying them.
+
+-- Keep the most advanced row for each pair (completed > in_progress > not_started),
+-- preferring the most recent completion, and delete the rest
+DELETE FROM activity_progress ap
+USING (
+  SELECT id,
+         row_number() OVER (
+           PARTITION BY child_id, activity_id
+           ORDER BY CASE status WHEN 'completed' THEN 2 WHEN 'in_progress' THEN 1 ELSE 0 END DESC,
+                    completed_at DESC NULLS LAST,
+                    id
+         ) AS rn
+    FROM activity_progress
+) ranked
+WHERE ap.id = ranked.id
+  AND ranked.rn > 1;
+
+-- Add the constraint if it is not there yet
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+     WHERE conrelid = 'activity_progress'::regclass
+       AND contype = 'u'
+       AND conname = 'activity_progress_child_id_activity_id_key'
+  ) THEN
+    ALTER TABLE activity_progress
+      ADD CONSTRAINT activity_progress_child_id_activity_id_key UNIQUE (child_id, activity_id);
+  END IF;
+END $$;
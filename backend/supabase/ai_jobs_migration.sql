@@ -0,0 +1,56 @@
+-- AI job queue
+-- Run this in Supabase SQL Editor on existing databases, then set AI_JOB_STORE=supabase
+-- to keep screenshot explanation jobs in the database instead of process memory.
+
+create table if not exists ai_jobs (
+  id uuid primary key default gen_random_uuid(),
+  user_key text not null,
+  kind text not null,
+  dedup_key text,
+  status text not null default 'queued' check (status in ('queued','running','succeeded','failed')),
+  payload jsonb,
+  result jsonb,
+  error text,
+  attempts int not null default 0,
+  created_at timestamptz not null default now(),
+  started_at timestamptz,
+  finished_at timestamptz
+);
+create index if not exists ai_jobs_pending_idx on ai_jobs (kind, created_at) where status in ('queued','running');
+create index if not exists ai_jobs_user_created_idx on ai_jobs (user_key, created_at);
+-- At most one live job per user and image
+create unique index if not exists ai_jobs_active_dedup_idx on ai_jobs (user_key, kind, dedup_key) where status in ('queued','running');
+
+-- Claim the oldest queued job of a kind for a worker. Rows are locked with SKIP LOCKED so
+-- concurrent workers never take the same job. Running jobs older than p_stale_seconds
+-- belonged to a worker that died and are claimed again until p_max_attempts is reached,
+-- after which they are marked failed.
+create or replace function claim_ai_job(p_kind text, p_stale_seconds int, p_max_attempts int)
+returns setof ai_jobs
+language plpgsql
+as $$
+begin
+  update ai_jobs
+     set status = 'failed', error = 'Job timed out', finished_at = now(), payload = null
+   where kind = p_kind
+     and status = 'running'
+     and attempts >= p_max_attempts
+     and started_at < now() - make_interval(secs => p_stale_seconds);
+
+  return query
+  update ai_jobs j
+     set status = 'running', started_at = now(), attempts = j.attempts + 1
+   where j.id = (
+     select c.id
+       from ai_jobs c
+      where c.kind = p_kind
+        and (c.status = 'queued'
+             or (c.status = 'running' and c.started_at < now() - make_interval(secs => p_stale_seconds)))
+        and c.attempts < p_max_attempts
+      order by c.created_at
+      limit 1
+      for update skip locked
+   )
+  returning j.*;
+end;
+$$;
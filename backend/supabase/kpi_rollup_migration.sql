@@ -0,0 +1,10 @@
+-- KPI rollup
+-- Run this in Supabase SQL Editor on existing databases, then apply the KPI ROLLUP
+-- section of schema.sql and backfill with `python rollup_kpis.py --full --weeks 12`.
+
+CREATE TABLE IF NOT EXISTS kpi_rollup_state (
+  name text PRIMARY KEY,
+  watermark timestamptz NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS activity_progress_completed_at_idx ON activity_progress (completed_at);
@@ -0,0 +1,18 @@
+-- Precomputed leaderboards
+-- Run this in Supabase SQL Editor on existing databases, then apply the LEADERBOARDS
+-- section of schema.sql and call POST /api/v1/analytics/admin/recompute-leaderboards
+-- once to seed the current week.
+
+ALTER TABLE leaderboards ADD COLUMN IF NOT EXISTS score int NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS leaderboard_scores (
+  period_start date,
+  period_end date,
+  child_id uuid REFERENCES children(id) ON DELETE CASCADE,
+  score int NOT NULL DEFAULT 0,
+  rank int,
+  percentile numeric,
+  PRIMARY KEY (period_start, child_id)
+);
+
+CREATE INDEX IF NOT EXISTS token_transactions_created_idx ON token_transactions (created_at);
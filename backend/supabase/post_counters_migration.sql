@@ -0,0 +1,87 @@
+-- Post engagement counters
+-- Run this in Supabase SQL Editor on existing databases. Adds the denormalized
+-- counters the community feed reads, installs the triggers that keep them in step,
+-- then backfills them from existing reactions and comments.
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS likes_count int NOT NULL DEFAULT 0;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS comments_count int NOT NULL DEFAULT 0;
+
+-- Post engagement counters (kept in step by triggers on reactions and comments,
+-- repaired by reconcile_post_counters)
+create or replace function adjust_post_counters(
+  p_post_id uuid,
+  p_likes_delta int default 0,
+  p_comments_delta int default 0
+)
+returns table (likes_count int, comments_count int)
+language sql
+as $$
+  update posts
+     set likes_count = greatest(posts.likes_count + p_likes_delta, 0),
+         comments_count = greatest(posts.comments_count + p_comments_delta, 0)
+   where posts.id = p_post_id
+  returning posts.likes_count, posts.comments_count;
+$$;
+
+-- Runs in the same transaction as the reaction/comment change, so the counter can
+-- never disagree with a row that was (or was not) actually inserted or deleted
+create or replace function post_counters_trigger()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_delta int := case when tg_op = 'INSERT' then 1 else -1 end;
+  v_post_id uuid;
+begin
+  if tg_op = 'INSERT' then
+    v_post_id := new.post_id;
+  else
+    v_post_id := old.post_id;
+  end if;
+
+  if tg_table_name = 'reactions' then
+    perform adjust_post_counters(v_post_id, v_delta, 0);
+  else
+    perform adjust_post_counters(v_post_id, 0, v_delta);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists reactions_post_counters on reactions;
+create trigger reactions_post_counters
+  after insert or delete on reactions
+  for each row
+  execute function post_counters_trigger();
+
+drop trigger if exists comments_post_counters on comments;
+create trigger comments_post_counters
+  after insert or delete on comments
+  for each row
+  execute function post_counters_trigger();
+
+create or replace function reconcile_post_counters()
+returns int
+language plpgsql
+as $$
+declare
+  repaired int;
+begin
+  with counts as (
+    select p.id,
+           (select count(*) from reactions r where r.post_id = p.id)::int as likes,
+           (select count(*) from comments c where c.post_id = p.id)::int as comments
+      from posts p
+  )
+  update posts
+     set likes_count = counts.likes,
+         comments_count = counts.comments
+    from counts
+   where posts.id = counts.id
+     and (posts.likes_count <> counts.likes or posts.comments_count <> counts.comments);
+  get diagnostics repaired = row_count;
+  return repaired;
+end;
+$$;
+
+SELECT reconcile_post_counters();
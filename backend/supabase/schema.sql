@@ -5,7 +5,7 @@
 create type role as enum ('parent','teacher','admin');
 create type task_type as enum ('in_app','pen_paper','game','audio');
 create type post_type as enum ('achievement','question');
-create type reason_type as enum ('activity_complete','weekly_goal','helpful_answer','post_like','engagement_bonus','purchase','gift');
+create type reason_type as enum ('activity_complete','weekly_goal','helpful_answer','post_like','engagement_bonus','purchase','gift','adjustment');
 create type redemption_status as enum ('requested','approved','fulfilled','canceled');
 
 -- PROFILES
@@ -145,6 +145,8 @@ create table if not exists posts (
   content text,
   media jsonb default '[]'::jsonb,
   anonymous boolean default false,
+  likes_count int not null default 0,
+  comments_count int not null default 0,
   created_at timestamptz default now()
 );
 create table if not exists comments (
@@ -195,6 +197,9 @@ create table if not exists messages (
 );
 
 -- TOKENS & SHOP
+-- token_transactions is the append-only ledger and the source of truth for balances;
+-- read them through token_balances(). The balance and weekly_earned columns are legacy
+-- and no longer written.
 create table if not exists token_accounts (
   child_id uuid primary key references children(id) on delete cascade,
   balance int default 0,
@@ -211,6 +216,15 @@ create table if not exists token_transactions (
   actor_id uuid references auth.users(id),
   created_at timestamptz default now()
 );
+create index if not exists token_transactions_account_created_idx on token_transactions (account_id, created_at);
+create index if not exists token_transactions_created_idx on token_transactions (created_at);
+-- Ledger sum per account up to (excluding) as_of, always taken at a week boundary
+create table if not exists token_balance_snapshots (
+  account_id uuid references token_accounts(child_id) on delete cascade,
+  as_of timestamptz not null,
+  balance int not null,
+  primary key (account_id, as_of)
+);
 create table if not exists shop_items (
   id uuid primary key default gen_random_uuid(),
   name text not null,
@@ -234,10 +248,21 @@ create table if not exists leaderboards (
   period_end date,
   class_id uuid references classes(id) on delete cascade,
   child_id uuid references children(id) on delete cascade,
+  score int not null default 0,
   rank int,
   percentile numeric,
   primary key (period_start, class_id, child_id)
 );
+-- Global (all children) standings per period; percentile is mirrored to token_accounts.rank_percentile
+create table if not exists leaderboard_scores (
+  period_start date,
+  period_end date,
+  child_id uuid references children(id) on delete cascade,
+  score int not null default 0,
+  rank int,
+  percentile numeric,
+  primary key (period_start, child_id)
+);
 
 -- ANALYTICS
 create table if not exists kpi_metrics (
@@ -250,6 +275,12 @@ create table if not exists kpi_metrics (
   source text default 'internal',
   primary key (child_id, metric, period_start)
 );
+-- Watermarks for the incremental KPI rollup
+create table if not exists kpi_rollup_state (
+  name text primary key,
+  watermark timestamptz not null
+);
+create index if not exists activity_progress_completed_at_idx on activity_progress (completed_at);
 create table if not exists external_integrations (
   id uuid primary key default gen_random_uuid(),
   name text,
@@ -276,4 +307,719 @@ create table if not exists notifications (
   payload jsonb,
   delivered_at timestamptz,
   read_at timestamptz
-); 
\ No newline at end of file
+);
+
+-- AI JOBS
+-- Queue for slow model calls (screenshot explanations). user_key is "user:<id>", or
+-- "ip:<address>" for unauthenticated calls. payload holds the downscaled image and is
+-- cleared once the job finishes.
+create table if not exists ai_jobs (
+  id uuid primary key default gen_random_uuid(),
+  user_key text not null,
+  kind text not null,
+  dedup_key text,
+  status text not null default 'queued' check (status in ('queued','running','succeeded','failed')),
+  payload jsonb,
+  result jsonb,
+  error text,
+  attempts int not null default 0,
+  created_at timestamptz not null default now(),
+  started_at timestamptz,
+  finished_at timestamptz
+);
+create index if not exists ai_jobs_pending_idx on ai_jobs (kind, created_at) where status in ('queued','running');
+create index if not exists ai_jobs_user_created_idx on ai_jobs (user_key, created_at);
+-- At most one live job per user and image
+create unique index if not exists ai_jobs_active_dedup_idx on ai_jobs (user_key, kind, dedup_key) where status in ('queued','running');
+
+-- FUNCTIONS
+
+-- Post engagement counters (kept in step by triggers on reactions and comments,
+-- repaired by reconcile_post_counters)
+create or replace function adjust_post_counters(
+  p_post_id uuid,
+  p_likes_delta int default 0,
+  p_comments_delta int default 0
+)
+returns table (likes_count int, comments_count int)
+language sql
+as $$
+  update posts
+     set likes_count = greatest(posts.likes_count + p_likes_delta, 0),
+         comments_count = greatest(posts.comments_count + p_comments_delta, 0)
+   where posts.id = p_post_id
+  returning posts.likes_count, posts.comments_count;
+$$;
+
+-- Runs in the same transaction as the reaction/comment change, so the counter can
+-- never disagree with a row that was (or was not) actually inserted or deleted
+create or replace function post_counters_trigger()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_delta int := case when tg_op = 'INSERT' then 1 else -1 end;
+  v_post_id uuid;
+begin
+  if tg_op = 'INSERT' then
+    v_post_id := new.post_id;
+  else
+    v_post_id := old.post_id;
+  end if;
+
+  if tg_table_name = 'reactions' then
+    perform adjust_post_counters(v_post_id, v_delta, 0);
+  else
+    perform adjust_post_counters(v_post_id, 0, v_delta);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists reactions_post_counters on reactions;
+create trigger reactions_post_counters
+  after insert or delete on reactions
+  for each row
+  execute function post_counters_trigger();
+
+drop trigger if exists comments_post_counters on comments;
+create trigger comments_post_counters
+  after insert or delete on comments
+  for each row
+  execute function post_counters_trigger();
+
+create or replace function reconcile_post_counters()
+returns int
+language plpgsql
+as $$
+declare
+  repaired int;
+begin
+  with counts as (
+    select p.id,
+           (select count(*) from reactions r where r.post_id = p.id)::int as likes,
+           (select count(*) from comments c where c.post_id = p.id)::int as comments
+      from posts p
+  )
+  update posts
+     set likes_count = counts.likes,
+         comments_count = counts.comments
+    from counts
+   where posts.id = counts.id
+     and (posts.likes_count <> counts.likes or posts.comments_count <> counts.comments);
+  get diagnostics repaired = row_count;
+  return repaired;
+end;
+$$;
+
+-- Completed activities per (child, booklet), for progress summaries
+create or replace function booklet_completion_counts(p_child_ids uuid[])
+returns table (child_id uuid, booklet_id uuid, completed int)
+language sql
+stable
+as $$
+  select ap.child_id, m.booklet_id, count(*)::int
+    from activity_progress ap
+    join activities a on a.id = ap.activity_id
+    join modules m on m.id = a.module_id
+   where ap.child_id = any(p_child_ids)
+     and ap.status = 'completed'
+   group by ap.child_id, m.booklet_id;
+$$;
+
+-- Attach proof to an activity without changing its status
+create or replace function save_activity_proof(
+  p_child_id uuid,
+  p_activity_id uuid,
+  p_proof_url text
+)
+returns activity_progress
+language sql
+as $$
+  insert into activity_progress (child_id, activity_id, status, proof_url, completed_at)
+  values (p_child_id, p_activity_id, 'not_started', p_proof_url, null)
+  on conflict (child_id, activity_id)
+  do update set proof_url = excluded.proof_url
+  returning *;
+$$;
+
+-- Most recent value of each requested metric per child (one row per child and metric)
+create or replace function latest_kpi_metrics(p_child_ids uuid[], p_metrics text[])
+returns table (child_id uuid, metric text, value_num numeric, period_start date)
+language sql
+stable
+as $$
+  select distinct on (k.child_id, k.metric) k.child_id, k.metric, k.value_num, k.period_start
+    from kpi_metrics k
+   where k.child_id = any(p_child_ids)
+     and k.metric = any(p_metrics)
+   order by k.child_id, k.metric, k.period_start desc;
+$$;
+
+-- Redeem a shop item atomically. Stock is taken with a conditional update and the
+-- account row is locked while its ledger balance is checked, so concurrent
+-- redemptions cannot overspend or oversell. Rejections raise P0001 with a
+-- user-facing message.
+create or replace function redeem_shop_item(
+  p_child_id uuid,
+  p_item_id uuid,
+  p_qty int,
+  p_actor_id uuid
+)
+returns table (redemption_id uuid, item_name text, cost int, remaining_balance int)
+language plpgsql
+as $$
+declare
+  v_name text;
+  v_cost int;
+  v_balance int;
+  v_redemption_id uuid;
+begin
+  if p_qty is null or p_qty < 1 then
+    raise exception 'Quantity must be at least 1';
+  end if;
+
+  update shop_items
+     set inventory_qty = inventory_qty - p_qty
+   where id = p_item_id
+     and is_active
+     and (inventory_qty is null or inventory_qty >= p_qty)
+  returning name, price * p_qty into v_name, v_cost;
+
+  if not found then
+    if exists (select 1 from shop_items where id = p_item_id and is_active) then
+      raise exception 'Insufficient inventory';
+    end if;
+    raise exception 'Shop item not found or not available';
+  end if;
+
+  -- Serialises spends per account; the balance itself comes from the ledger
+  perform 1 from token_accounts where token_accounts.child_id = p_child_id for update;
+  if not found then
+    raise exception 'Insufficient tokens';
+  end if;
+
+  select b.balance into v_balance from token_balances(array[p_child_id]) b;
+  if v_balance < v_cost then
+    raise exception 'Insufficient tokens';
+  end if;
+
+  insert into redemptions (account_id, item_id, qty, status)
+  values (p_child_id, p_item_id, p_qty, 'requested')
+  returning id into v_redemption_id;
+
+  insert into token_transactions (account_id, delta, reason, ref_table, ref_id, actor_id)
+  values (p_child_id, -v_cost, 'purchase', 'redemptions', v_redemption_id, p_actor_id);
+
+  return query select v_redemption_id, v_name, v_cost, v_balance - v_cost;
+end;
+$$;
+
+-- Current balance (latest snapshot plus the ledger tail after it) and tokens earned
+-- since the week started. Snapshots sit on week boundaries, so the tail covers the week.
+create or replace function token_balances(p_child_ids uuid[])
+returns table (child_id uuid, balance int, weekly_earned int)
+language sql
+stable
+as $$
+  select a.account_id,
+         (coalesce(s.balance, 0) + coalesce(t.tail, 0))::int,
+         coalesce(t.earned, 0)::int
+    from unnest(p_child_ids) as a(account_id)
+    left join lateral (
+      select ts.balance, ts.as_of
+        from token_balance_snapshots ts
+       where ts.account_id = a.account_id
+       order by ts.as_of desc
+       limit 1
+    ) s on true
+    left join lateral (
+      select sum(tt.delta) as tail,
+             sum(tt.delta) filter (where tt.delta > 0 and tt.reason::text <> 'adjustment'
+                                     and tt.created_at >= date_trunc('week', now())) as earned
+        from token_transactions tt
+       where tt.account_id = a.account_id
+         and tt.created_at >= coalesce(s.as_of, '-infinity')
+    ) t on true;
+$$;
+
+-- Weekly rollover: snapshot every account at the start of the current week from its
+-- previous snapshot plus the transactions since, so only last week's ledger is read.
+-- Idempotent; run some time after the week starts so in-flight writes have committed.
+create or replace function roll_token_snapshots()
+returns int
+language plpgsql
+as $$
+declare
+  v_as_of timestamptz := date_trunc('week', now());
+  rolled int;
+begin
+  insert into token_balance_snapshots (account_id, as_of, balance)
+  select a.child_id,
+         v_as_of,
+         coalesce(s.balance, 0) + coalesce((
+           select sum(tt.delta)
+             from token_transactions tt
+            where tt.account_id = a.child_id
+              and tt.created_at >= coalesce(s.as_of, '-infinity')
+              and tt.created_at < v_as_of
+         ), 0)
+    from token_accounts a
+    left join lateral (
+      select ts.balance, ts.as_of
+        from token_balance_snapshots ts
+       where ts.account_id = a.child_id
+         and ts.as_of < v_as_of
+       order by ts.as_of desc
+       limit 1
+    ) s on true
+  on conflict (account_id, as_of) do nothing;
+  get diagnostics rolled = row_count;
+  return rolled;
+end;
+$$;
+
+-- Recompute snapshots for a batch of accounts from the full ledger, replacing any
+-- existing ones (used after backfills or manual ledger fixes)
+create or replace function rebuild_token_snapshots(p_account_ids uuid[])
+returns int
+language plpgsql
+as $$
+declare
+  v_as_of timestamptz := date_trunc('week', now());
+  rebuilt int;
+begin
+  delete from token_balance_snapshots where account_id = any(p_account_ids);
+
+  insert into token_balance_snapshots (account_id, as_of, balance)
+  select a.child_id,
+         v_as_of,
+         coalesce((
+           select sum(tt.delta)
+             from token_transactions tt
+            where tt.account_id = a.child_id
+              and tt.created_at < v_as_of
+         ), 0)
+    from token_accounts a
+   where a.child_id = any(p_account_ids);
+  get diagnostics rebuilt = row_count;
+  return rebuilt;
+end;
+$$;
+
+-- LEADERBOARDS
+-- Score is tokens earned in the week (credits other than balance adjustments).
+-- Ranks are competition ranks (1 + number of children with a higher score),
+-- so an award only moves the children it overtakes.
+
+create or replace function leaderboard_percentile(p_rank int, p_total int)
+returns numeric
+language sql
+immutable
+as $$
+  select case when p_total <= 1 then 100.0
+              else round(100.0 * (p_total - p_rank) / (p_total - 1), 1) end;
+$$;
+
+-- Incremental maintenance after tokens are earned: the child moves from v_old to v_new,
+-- and only the children scoring in [v_old, v_new) drop one place. Children joining a
+-- board mid-period enter at score 0; the periodic full recompute refreshes everyone's
+-- percentile for the new board size.
+create or replace function apply_leaderboard_delta(
+  p_child_id uuid,
+  p_delta int,
+  p_at timestamptz default now()
+)
+returns void
+language plpgsql
+as $$
+declare
+  v_period date := date_trunc('week', p_at)::date;
+  v_period_end date := (date_trunc('week', p_at) + interval '6 days')::date;
+  v_class_id uuid;
+  v_old int;
+  v_new int;
+  v_total int;
+begin
+  if p_delta <= 0 then
+    return;
+  end if;
+
+  -- Awards in the same period are applied one at a time so ranks stay consistent
+  perform pg_advisory_xact_lock(hashtext('leaderboard:' || v_period));
+
+  -- Global board
+  insert into leaderboard_scores (period_start, period_end, child_id, score, rank)
+  select v_period, v_period_end, p_child_id, 0,
+         1 + (select count(*) from leaderboard_scores where period_start = v_period and score > 0)
+  on conflict (period_start, child_id) do nothing;
+
+  select score into v_old from leaderboard_scores where period_start = v_period and child_id = p_child_id;
+  v_new := v_old + p_delta;
+  select count(*) into v_total from leaderboard_scores where period_start = v_period;
+
+  update leaderboard_scores
+     set rank = rank + 1,
+         percentile = leaderboard_percentile(rank + 1, v_total)
+   where period_start = v_period
+     and child_id <> p_child_id
+     and score >= v_old and score < v_new;
+
+  update leaderboard_scores
+     set score = v_new,
+         rank = 1 + (select count(*) from leaderboard_scores
+                      where period_start = v_period and score > v_new),
+         percentile = leaderboard_percentile(1 + (select count(*) from leaderboard_scores
+                                                   where period_start = v_period and score > v_new), v_total)
+   where period_start = v_period and child_id = p_child_id;
+
+  update token_accounts ta
+     set rank_percentile = ls.percentile
+    from leaderboard_scores ls
+   where ls.period_start = v_period
+     and ls.child_id = ta.child_id
+     and ls.score >= v_old and ls.score <= v_new;
+
+  -- Class boards
+  for v_class_id in select e.class_id from enrollments e where e.child_id = p_child_id loop
+    insert into leaderboards (period_start, period_end, class_id, child_id, score, rank)
+    select v_period, v_period_end, v_class_id, p_child_id, 0,
+           1 + (select count(*) from leaderboards
+                 where period_start = v_period and class_id = v_class_id and score > 0)
+    on conflict (period_start, class_id, child_id) do nothing;
+
+    select score into v_old from leaderboards
+     where period_start = v_period and class_id = v_class_id and child_id = p_child_id;
+    v_new := v_old + p_delta;
+    select count(*) into v_total from leaderboards where period_start = v_period and class_id = v_class_id;
+
+    update leaderboards
+       set rank = rank + 1,
+           percentile = leaderboard_percentile(rank + 1, v_total)
+     where period_start = v_period
+       and class_id = v_class_id
+       and child_id <> p_child_id
+       and score >= v_old and score < v_new;
+
+    update leaderboards
+       set score = v_new,
+           rank = 1 + (select count(*) from leaderboards
+                        where period_start = v_period and class_id = v_class_id and score > v_new),
+           percentile = leaderboard_percentile(1 + (select count(*) from leaderboards
+                                                     where period_start = v_period and class_id = v_class_id and score > v_new), v_total)
+     where period_start = v_period and class_id = v_class_id and child_id = p_child_id;
+  end loop;
+end;
+$$;
+
+create or replace function token_transactions_leaderboard_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform apply_leaderboard_delta(new.account_id, new.delta, coalesce(new.created_at, now()));
+  return new;
+end;
+$$;
+
+drop trigger if exists token_transactions_leaderboard on token_transactions;
+create trigger token_transactions_leaderboard
+  after insert on token_transactions
+  for each row
+  when (new.delta > 0 and new.reason::text <> 'adjustment')
+  execute function token_transactions_leaderboard_trigger();
+
+-- Full recompute of a batch of class boards for a period from the ledger
+create or replace function recompute_class_leaderboards(p_period_start date, p_class_ids uuid[])
+returns int
+language plpgsql
+as $$
+declare
+  v_from timestamptz := p_period_start::timestamptz;
+  v_to timestamptz := p_period_start::timestamptz + interval '7 days';
+  written int;
+begin
+  perform pg_advisory_xact_lock(hashtext('leaderboard:' || p_period_start));
+
+  insert into leaderboards (period_start, period_end, class_id, child_id, score, rank, percentile)
+  select p_period_start,
+         p_period_start + 6,
+         s.class_id,
+         s.child_id,
+         s.score,
+         rank() over w,
+         leaderboard_percentile((rank() over w)::int, (count(*) over (partition by s.class_id))::int)
+    from (
+      select e.class_id, e.child_id, coalesce(sum(tt.delta), 0)::int as score
+        from enrollments e
+        left join token_transactions tt
+          on tt.account_id = e.child_id
+         and tt.delta > 0
+         and tt.reason::text <> 'adjustment'
+         and tt.created_at >= v_from and tt.created_at < v_to
+       where e.class_id = any(p_class_ids)
+       group by e.class_id, e.child_id
+    ) s
+  window w as (partition by s.class_id order by s.score desc)
+  on conflict (period_start, class_id, child_id)
+  do update set score = excluded.score, rank = excluded.rank, percentile = excluded.percentile;
+  get diagnostics written = row_count;
+
+  -- Children who left a class since the last recompute
+  delete from leaderboards l
+   where l.period_start = p_period_start
+     and l.class_id = any(p_class_ids)
+     and not exists (select 1 from enrollments e where e.class_id = l.class_id and e.child_id = l.child_id);
+
+  return written;
+end;
+$$;
+
+-- Full recompute of the global board for a period, also refreshing token_accounts.rank_percentile.
+-- Reads only that period's slice of the ledger.
+create or replace function recompute_global_leaderboard(p_period_start date)
+returns int
+language plpgsql
+as $$
+declare
+  v_from timestamptz := p_period_start::timestamptz;
+  v_to timestamptz := p_period_start::timestamptz + interval '7 days';
+  written int;
+begin
+  perform pg_advisory_xact_lock(hashtext('leaderboard:' || p_period_start));
+
+  insert into leaderboard_scores (period_start, period_end, child_id, score, rank, percentile)
+  select p_period_start,
+         p_period_start + 6,
+         s.child_id,
+         s.score,
+         rank() over w,
+         leaderboard_percentile((rank() over w)::int, (count(*) over ())::int)
+    from (
+      select ta.child_id, coalesce(e.earned, 0)::int as score
+        from token_accounts ta
+        left join (
+          select account_id, sum(delta) as earned
+            from token_transactions
+           where delta > 0
+             and reason::text <> 'adjustment'
+             and created_at >= v_from and created_at < v_to
+           group by account_id
+        ) e on e.account_id = ta.child_id
+    ) s
+  window w as (order by s.score desc)
+  on conflict (period_start, child_id)
+  do update set score = excluded.score, rank = excluded.rank, percentile = excluded.percentile;
+  get diagnostics written = row_count;
+
+  if p_period_start = date_trunc('week', now())::date then
+    update token_accounts ta
+       set rank_percentile = ls.percentile
+      from leaderboard_scores ls
+     where ls.period_start = p_period_start
+       and ls.child_id = ta.child_id
+       and ta.rank_percentile is distinct from ls.percentile;
+  end if;
+
+  return written;
+end;
+$$;
+
+-- KPI ROLLUP
+-- Weekly per-child KPIs in kpi_metrics (source 'rollup'), recomputed idempotently from
+-- activity_progress and token_transactions:
+--   activities_completed  activities completed during the week
+--   reading_minutes       estimated minutes of those activities
+--   tokens_earned         tokens earned during the week
+--   streak_days           consecutive active days up to the end of the week (or today)
+--   activities_scheduled  activities in booklets scheduled for the week
+--   weekly_progress       percentage of the scheduled activities completed
+
+create or replace function rollup_weekly_kpis(p_child_ids uuid[], p_from date, p_to date)
+returns int
+language plpgsql
+as $$
+declare
+  v_from date := date_trunc('week', p_from)::date;
+  v_to date := least(p_to, (date_trunc('week', now()) + interval '7 days')::date);
+  written int;
+begin
+  with weeks as (
+    select c.child_id, w::date as week_start, least(w::date + 6, current_date) as end_day
+      from unnest(p_child_ids) as c(child_id)
+     cross join generate_series(v_from, v_to - 1, interval '7 days') as w
+  ),
+  completions as (
+    select ap.child_id,
+           date_trunc('week', ap.completed_at)::date as week_start,
+           count(*) as completed,
+           coalesce(sum(a.est_minutes), 0) as minutes
+      from activity_progress ap
+      join activities a on a.id = ap.activity_id
+     where ap.child_id = any(p_child_ids)
+       and ap.status = 'completed'
+       and ap.completed_at >= v_from and ap.completed_at < v_to
+     group by 1, 2
+  ),
+  earned as (
+    select tt.account_id as child_id,
+           date_trunc('week', tt.created_at)::date as week_start,
+           sum(tt.delta) as tokens
+      from token_transactions tt
+     where tt.account_id = any(p_child_ids)
+       and tt.delta > 0
+       and tt.reason::text <> 'adjustment'
+       and tt.created_at >= v_from and tt.created_at < v_to
+     group by 1, 2
+  ),
+  scheduled as (
+    select date_trunc('week', b.week_start)::date as week_start, a.id as activity_id
+      from booklets b
+      join modules m on m.booklet_id = b.id
+      join activities a on a.module_id = m.id
+     where b.week_start >= v_from and b.week_start < v_to
+  ),
+  scheduled_progress as (
+    select w.child_id,
+           w.week_start,
+           count(s.activity_id) as total,
+           count(ap.id) as done
+      from weeks w
+      join scheduled s on s.week_start = w.week_start
+      left join activity_progress ap
+        on ap.child_id = w.child_id
+       and ap.activity_id = s.activity_id
+       and ap.status = 'completed'
+     group by 1, 2
+  ),
+  active_days as (
+    select distinct ap.child_id, ap.completed_at::date as day
+      from activity_progress ap
+     where ap.child_id = any(p_child_ids)
+       and ap.status = 'completed'
+       and ap.completed_at >= v_from - 366 and ap.completed_at < v_to
+  ),
+  runs as (
+    select child_id, min(day) as run_start, max(day) as run_end
+      from (
+        select child_id, day, day - (row_number() over (partition by child_id order by day))::int as grp
+          from active_days
+      ) d
+     group by child_id, grp
+  ),
+  streaks as (
+    select w.child_id,
+           w.week_start,
+           coalesce(max(least(r.run_end, w.end_day) - r.run_start + 1)
+                    filter (where r.run_start <= w.end_day and r.run_end >= w.end_day - 1), 0) as days
+      from weeks w
+      left join runs r on r.child_id = w.child_id
+     group by 1, 2
+  ),
+  metric_rows as (
+    select w.child_id, w.week_start, 'activities_completed' as metric, coalesce(c.completed, 0)::numeric as value_num, 'count' as unit
+      from weeks w left join completions c using (child_id, week_start)
+    union all
+    select w.child_id, w.week_start, 'reading_minutes', coalesce(c.minutes, 0), 'minutes'
+      from weeks w left join completions c using (child_id, week_start)
+    union all
+    select w.child_id, w.week_start, 'tokens_earned', coalesce(e.tokens, 0), 'tokens'
+      from weeks w left join earned e using (child_id, week_start)
+    union all
+    select s.child_id, s.week_start, 'streak_days', s.days, 'days'
+      from streaks s
+    union all
+    select sp.child_id, sp.week_start, 'activities_scheduled', sp.total, 'count'
+      from scheduled_progress sp
+    union all
+    select sp.child_id, sp.week_start, 'weekly_progress', round(100.0 * sp.done / sp.total, 1), 'percentage'
+      from scheduled_progress sp
+     where sp.total > 0
+  )
+  insert into kpi_metrics (child_id, metric, value_num, unit, period_start, period_end, source)
+  select child_id, metric, value_num, unit, week_start, week_start + 6, 'rollup'
+    from metric_rows
+  on conflict (child_id, metric, period_start)
+  do update set value_num = excluded.value_num,
+                unit = excluded.unit,
+                period_end = excluded.period_end,
+                source = excluded.source;
+  get diagnostics written = row_count;
+  return written;
+end;
+$$;
+
+-- Incremental rollup: recompute only the children and weeks touched since the last run.
+-- Re-reads a short overlap before the watermark so rows committed late are not missed.
+create or replace function rollup_recent_kpis()
+returns int
+language plpgsql
+as $$
+declare
+  v_now timestamptz := now();
+  v_since timestamptz;
+  v_child_ids uuid[];
+  v_from timestamptz;
+  written int := 0;
+begin
+  select watermark into v_since from kpi_rollup_state where name = 'weekly_kpis' for update;
+  if not found then
+    v_since := date_trunc('week', v_now);
+    insert into kpi_rollup_state (name, watermark) values ('weekly_kpis', v_since);
+  end if;
+  v_since := v_since - interval '5 minutes';
+
+  select array_agg(distinct t.child_id), min(t.ts)
+    into v_child_ids, v_from
+    from (
+      select ap.child_id, ap.completed_at as ts
+        from activity_progress ap
+       where ap.completed_at >= v_since
+      union all
+      select tt.account_id, tt.created_at
+        from token_transactions tt
+       where tt.created_at >= v_since
+    ) t;
+
+  if v_child_ids is not null then
+    written := rollup_weekly_kpis(v_child_ids, v_from::date, (date_trunc('week', v_now) + interval '7 days')::date);
+  end if;
+
+  update kpi_rollup_state set watermark = v_now where name = 'weekly_kpis';
+  return written;
+end;
+$$;
+
+-- Claim the oldest queued job of a kind for a worker. Rows are locked with SKIP LOCKED so
+-- concurrent workers never take the same job. Running jobs older than p_stale_seconds
+-- belonged to a worker that died and are claimed again until p_max_attempts is reached,
+-- after which they are marked failed.
+create or replace function claim_ai_job(p_kind text, p_stale_seconds int, p_max_attempts int)
+returns setof ai_jobs
+language plpgsql
+as $$
+begin
+  update ai_jobs
+     set status = 'failed', error = 'Job timed out', finished_at = now(), payload = null
+   where kind = p_kind
+     and status = 'running'
+     and attempts >= p_max_attempts
+     and started_at < now() - make_interval(secs => p_stale_seconds);
+
+  return query
+  update ai_jobs j
+     set status = 'running', started_at = now(), attempts = j.attempts + 1
+   where j.id = (
+     select c.id
+       from ai_jobs c
+      where c.kind = p_kind
+        and (c.status = 'queued'
+             or (c.status = 'running' and c.started_at < now() - make_interval(secs => p_stale_seconds)))
+        and c.attempts < p_max_attempts
+      order by c.created_at
+      limit 1
+      for update skip locked
+   )
+  returning j.*;
+end;
+$$;
@@ -0,0 +1,191 @@
+-- Move token balances onto the ledger
+-- Run this in Supabase SQL Editor on existing databases; it is self-contained, so do not
+-- apply schema.sql first (token_balances() reads token_balance_snapshots, which must
+-- exist before the function is created). Balances are then read through
+-- token_balances(); token_accounts.balance and weekly_earned are no longer written.
+
+-- Step 1: run this statement on its own first; a new enum value can't be used
+-- in the same transaction that adds it
+ALTER TYPE reason_type ADD VALUE IF NOT EXISTS 'adjustment';
+
+-- Step 2: snapshot table and ledger index
+CREATE TABLE IF NOT EXISTS token_balance_snapshots (
+  account_id uuid REFERENCES token_accounts(child_id) ON DELETE CASCADE,
+  as_of timestamptz NOT NULL,
+  balance int NOT NULL,
+  PRIMARY KEY (account_id, as_of)
+);
+CREATE INDEX IF NOT EXISTS token_transactions_account_created_idx ON token_transactions (account_id, created_at);
+
+-- Step 3: ledger balance functions and the ledger-based redemption
+-- Redeem a shop item atomically. Stock is taken with a conditional update and the
+-- account row is locked while its ledger balance is checked, so concurrent
+-- redemptions cannot overspend or oversell. Rejections raise P0001 with a
+-- user-facing message.
+create or replace function redeem_shop_item(
+  p_child_id uuid,
+  p_item_id uuid,
+  p_qty int,
+  p_actor_id uuid
+)
+returns table (redemption_id uuid, item_name text, cost int, remaining_balance int)
+language plpgsql
+as $$
+declare
+  v_name text;
+  v_cost int;
+  v_balance int;
+  v_redemption_id uuid;
+begin
+  if p_qty is null or p_qty < 1 then
+    raise exception 'Quantity must be at least 1';
+  end if;
+
+  update shop_items
+     set inventory_qty = inventory_qty - p_qty
+   where id = p_item_id
+     and is_active
+     and (inventory_qty is null or inventory_qty >= p_qty)
+  returning name, price * p_qty into v_name, v_cost;
+
+  if not found then
+    if exists (select 1 from shop_items where id = p_item_id and is_active) then
+      raise exception 'Insufficient inventory';
+    end if;
+    raise exception 'Shop item not found or not available';
+  end if;
+
+  -- Serialises spends per account; the balance itself comes from the ledger
+  perform 1 from token_accounts where token_accounts.child_id = p_child_id for update;
+  if not found then
+    raise exception 'Insufficient tokens';
+  end if;
+
+  select b.balance into v_balance from token_balances(array[p_child_id]) b;
+  if v_balance < v_cost then
+    raise exception 'Insufficient tokens';
+  end if;
+
+  insert into redemptions (account_id, item_id, qty, status)
+  values (p_child_id, p_item_id, p_qty, 'requested')
+  returning id into v_redemption_id;
+
+  insert into token_transactions (account_id, delta, reason, ref_table, ref_id, actor_id)
+  values (p_child_id, -v_cost, 'purchase', 'redemptions', v_redemption_id, p_actor_id);
+
+  return query select v_redemption_id, v_name, v_cost, v_balance - v_cost;
+end;
+$$;
+
+-- Current balance (latest snapshot plus the ledger tail after it) and tokens earned
+-- since the week started. Snapshots sit on week boundaries, so the tail covers the week.
+create or replace function token_balances(p_child_ids uuid[])
+returns table (child_id uuid, balance int, weekly_earned int)
+language sql
+stable
+as $$
+  select a.account_id,
+         (coalesce(s.balance, 0) + coalesce(t.tail, 0))::int,
+         coalesce(t.earned, 0)::int
+    from unnest(p_child_ids) as a(account_id)
+    left join lateral (
+      select ts.balance, ts.as_of
+        from token_balance_snapshots ts
+       where ts.account_id = a.account_id
+       order by ts.as_of desc
+       limit 1
+    ) s on true
+    left join lateral (
+      select sum(tt.delta) as tail,
+             sum(tt.delta) filter (where tt.delta > 0 and tt.reason::text <> 'adjustment'
+                                     and tt.created_at >= date_trunc('week', now())) as earned
+        from token_transactions tt
+       where tt.account_id = a.account_id
+         and tt.created_at >= coalesce(s.as_of, '-infinity')
+    ) t on true;
+$$;
+
+-- Weekly rollover: snapshot every account at the start of the current week from its
+-- previous snapshot plus the transactions since, so only last week's ledger is read.
+-- Idempotent; run some time after the week starts so in-flight writes have committed.
+create or replace function roll_token_snapshots()
+returns int
+language plpgsql
+as $$
+declare
+  v_as_of timestamptz := date_trunc('week', now());
+  rolled int;
+begin
+  insert into token_balance_snapshots (account_id, as_of, balance)
+  select a.child_id,
+         v_as_of,
+         coalesce(s.balance, 0) + coalesce((
+           select sum(tt.delta)
+             from token_transactions tt
+            where tt.account_id = a.child_id
+              and tt.created_at >= coalesce(s.as_of, '-infinity')
+              and tt.created_at < v_as_of
+         ), 0)
+    from token_accounts a
+    left join lateral (
+      select ts.balance, ts.as_of
+        from token_balance_snapshots ts
+       where ts.account_id = a.child_id
+         and ts.as_of < v_as_of
+       order by ts.as_of desc
+       limit 1
+    ) s on true
+  on conflict (account_id, as_of) do nothing;
+  get diagnostics rolled = row_count;
+  return rolled;
+end;
+$$;
+
+-- Recompute snapshots for a batch of accounts from the full ledger, replacing any
+-- existing ones (used after backfills or manual ledger fixes)
+create or replace function rebuild_token_snapshots(p_account_ids uuid[])
+returns int
+language plpgsql
+as $$
+declare
+  v_as_of timestamptz := date_trunc('week', now());
+  rebuilt int;
+begin
+  delete from token_balance_snapshots where account_id = any(p_account_ids);
+
+  insert into token_balance_snapshots (account_id, as_of, balance)
+  select a.child_id,
+         v_as_of,
+         coalesce((
+           select sum(tt.delta)
+             from token_transactions tt
+            where tt.account_id = a.child_id
+              and tt.created_at < v_as_of
+         ), 0)
+    from token_accounts a
+   where a.child_id = any(p_account_ids);
+  get diagnostics rebuilt = row_count;
+  return rebuilt;
+end;
+$$;
+
+-- Step 4: where the stored balance and the ledger disagree, record the difference as an
+-- opening adjustment dated before the account's first transaction, so the ledger
+-- reproduces the balances users see today
+INSERT INTO token_transactions (account_id, delta, reason, ref_table, created_at)
+SELECT ta.child_id,
+       coalesce(ta.balance, 0) - coalesce(l.total, 0),
+       'adjustment',
+       'token_accounts',
+       coalesce(l.first_at, now()) - interval '1 second'
+  FROM token_accounts ta
+  LEFT JOIN (
+    SELECT account_id, sum(delta) AS total, min(created_at) AS first_at
+      FROM token_transactions
+     GROUP BY account_id
+  ) l ON l.account_id = ta.child_id
+ WHERE coalesce(ta.balance, 0) <> coalesce(l.total, 0);
+
+-- Step 5: first snapshot for every account. For large tables use
+-- `python rebuild_token_balances.py` instead, which works in batches.
+SELECT rebuild_token_snapshots(array(SELECT child_id FROM token_accounts));